@@ -6,54 +6,59 @@ import os
 import json
 import math
 import time
+import asyncio
+import argparse
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import Dict, List, Optional, Sequence, Tuple
 from pydantic import BaseModel
-import enum
 
 # pip install google-genai pydantic pandas
 from google import genai
 
+from dataset_store import CLEARED, DATASET_DIR, KEY, append_labels, read_dataset
+from label_journal import JOURNAL_PATH, merge as merge_journal, record as journal_labels
+from label_cache import CACHE_DB, LabelCache, normalize_text, prompt_version
+from label_planner import plan_labeling
+from label_tasks import TASKS, build_prompt, check_fields, response_model, select_rows
+from near_duplicates import INDEX_DB as NEAR_DUPLICATE_DB, NearDuplicateIndex
+from lang_id import MIN_CONFIDENCE as LANGUAGE_MIN_CONFIDENCE, detect as detect_language
+from local_classifier import LocalClassifier, field_source, print_report, row_texts, source_column
+from local_classifier import available as local_classifier_available, train as train_local_classifier
+from quota_limiter import (QuotaLimiter, backoff_delay, describe_error, estimate_tokens, is_quota_error,
+                           is_row_error, is_transient_error)
+
 # ----------------------------
 # Config
 # ----------------------------
-CSV_PATH_IN  = "data/natur_reacties_full.csv"          # <-- change if your file has a different name
 CSV_PATH_OUT = "datanatur_reacties_labeled.csv"
 TEXT_COLUMN  = "qna_text"                     # column with opinion text
-BATCH_SIZE   = 20
+BATCH_SIZE   = 100  # Most rows per API call; batches are otherwise filled up to the token budgets below
+PROMPT_TOKEN_BUDGET = 12_000  # Estimated prompt tokens per call, instructions included
+RESPONSE_TOKEN_BUDGET = 4_000  # Estimated response tokens per call (OUTPUT_TOKENS_PER_ITEM per row)
+MAX_ITEM_TOKENS = 3_000  # Longer texts are cut to about this many tokens; 0 disables truncation
+TRUNCATION_MARKER = "[…]"
 MODEL_NAME   = "gemini-2.5-flash"
-SAVE_INTERVAL = 5  # Save progress every N batches
-SLEEP_TIME = 4  # Sleep time in seconds between API calls
-START_FRESH = False  # Set to True to start from beginning, False to resume from where you left off
-
-# Define what “For/Against” means for your task.
-POLICY_STATEMENT = (
-    "the proposal to extend the Dutch naturalization waiting period from 5 years to 10 years"
-)
-
-# ----------------------------
-# Structured output types
-# ----------------------------
-class Stance(enum.Enum):
-    FOR = "For"
-    AGAINST = "Against"
-
-class Language(enum.Enum):
-    DUTCH = "Dutch"
-    ENGLISH = "English"
-    BOTH = "Both"
-    OTHER = "Other"
-
-class ImmigrantStatus(enum.Enum):
-    YES = "Yes"
-    NO = "No"
-    UNCLEAR = "Unclear"
-
-class OpinionLabel(BaseModel):
-    row_index: int
-    label: Stance
-    language: Language
-    identifies_as_immigrant: ImmigrantStatus
+# Concurrency and quota: set the limits to your API key's quota for MODEL_NAME
+MAX_IN_FLIGHT = 8  # generate_content calls running at once
+REQUESTS_PER_MINUTE = 150
+TOKENS_PER_MINUTE = 1_000_000
+OUTPUT_TOKENS_PER_ITEM = 40  # Expected response tokens per row, counted against TOKENS_PER_MINUTE
+MAX_ATTEMPTS = 5  # Attempts per batch on quota, server and timeout errors
+USE_CACHE = True  # Reuse stored labels for text already classified with this model and prompt
+CACHE_TASK = "opinion"
+PROMPT_VERSION = "v1"  # Bump to relabel when the meaning of the labels changes without the prompt text changing
+START_FRESH = False  # Set to True to start from beginning, False to resume from where you left off (cached labels are still reused)
+LABEL_COLUMNS = list(TASKS)  # Every registered label field (see label_tasks.py)
+# Local pre-classifier: rows it (and the offline language detector) labels confidently skip Gemini
+USE_LOCAL_CLASSIFIER = True
+LOCAL_MIN_CONFIDENCE = 0.9  # Per field; pick it from the held-out report (python local_classifier.py report)
+RETRAIN_AFTER_DAYS = 7  # Retrain from the latest LLM labels when the saved model is older than this
+USE_NEAR_DUPLICATES = True  # Label one row per near-duplicate cluster and copy its labels to the others
+CLUSTER_COLUMN = "cluster_id"
+LABEL_ERROR_COLUMN = "label_error"  # Why a row could not be labeled; such rows are skipped on later runs
+LANGUAGE_CONFIDENCE_COLUMN = "language_confidence"  # Offline detector's confidence, written for every row it checks
+RETRY_UNLABELABLE = False  # Set to True to try the rows with a label_error again
 
 # ----------------------------
 # Gemini client
@@ -63,158 +68,564 @@ def load_json_api(path: str) -> Dict:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-api_key = load_json_api("api.json")["gemini_key_2"]
-client = genai.Client(api_key=api_key)
-
-def chunk_indices(n_rows: int, batch_size: int):
-    for start in range(0, n_rows, batch_size):
-        yield start, min(start + batch_size, n_rows)
-
-def build_prompt(items: List[Dict]) -> str:
-    """
-    items: list of {row_index: int, text: str}
-    """
-    return (
-        "You are a careful annotator.\n"
-        f"Task: For each item, read the 'text' and classify the author's stance toward {POLICY_STATEMENT}.\n"
-        "Return a JSON array of objects with fields:\n"
-        "- row_index: the same integer we provide\n"
-        "- label: one of \"For\" or \"Against\" only\n"
-        "- language: one of \"Dutch\", \"English\", \"Both\", or \"Other\" (detect the language of the text)\n"
-        "- identifies_as_immigrant: one of \"Yes\", \"No\", or \"Unclear\" (does the author identify themselves as an immigrant/migrant?)\n\n"
-        "Decision rules:\n"
-        "- \"For\"  = the author supports the proposal.\n"
-        "- \"Against\" = the author opposes the proposal.\n"
-        "If the stance is mixed or ambiguous, pick the more likely one—do not return any other labels.\n\n"
-        "- \"Dutch\" = text is primarily in Dutch\n"
-        "- \"English\" = text is primarily in English\n"
-        "- \"Other\" = text is in another language or mixed\n\n"
-        "- \"Yes\" = the author explicitly identifies as an immigrant/migrant or strongly implies they are\n"
-        "- \"No\" = the author clearly indicates they are not an immigrant/migrant\n"
-        "- \"Unclear\" = there is no clear indication either way\n\n"
-        "Items to classify (JSON):\n"
-        f"{json.dumps(items, ensure_ascii=False)}"
-    )
-
-def classify_batch(df_batch: pd.DataFrame) -> List[OpinionLabel]:
+API_KEY_FILE = "api.json"
+API_KEY_NAME = "gemini_key_2"
+client = None  # Created from API_KEY_FILE on first use, unless set_client() gave another one
+
+def set_client(new_client) -> None:
+    """Use new_client for every call: a genai.Client, or a stand-in such as fake_gemini.FakeClient."""
+    global client
+    client = new_client
+
+def get_client():
+    global client
+    if client is None:
+        client = genai.Client(api_key=load_json_api(API_KEY_FILE)[API_KEY_NAME])
+    return client
+
+def item_text(row: pd.Series) -> str:
+    # Collect text from both qna_text and qna columns
+    text_parts = []
+    
+    # Get qna_text if available
+    qna_text = str(row.get("qna_text", "") or "").strip()
+    if qna_text:
+        text_parts.append(qna_text)
+    
+    # Get qna if available (might be JSON string)
+    qna = str(row.get("qna", "") or "").strip()
+    if qna and qna != qna_text:  # Avoid duplication
+        text_parts.append(qna)
+    
+    # Combine both columns
+    text = " ".join(text_parts).strip()
+    
+    # Fallback: if text still empty, build from other columns (rare)
+    if not text:
+        parts = [
+            str(row.get("detail_naam", "")),
+            str(row.get("detail_plaats", "")),
+        ]
+        text = " ".join([p for p in parts if p]).strip()
+
+    return truncate_text(text)
+
+def truncate_text(text: str) -> str:
+    """Cut texts longer than MAX_ITEM_TOKENS, keeping the start and the end (where stances are usually stated)."""
+    if not MAX_ITEM_TOKENS or estimate_tokens(text) <= MAX_ITEM_TOKENS:
+        return text
+    keep = MAX_ITEM_TOKENS * 4 // 2
+    return f"{text[:keep].rstrip()} {TRUNCATION_MARKER} {text[-keep:].lstrip()}"
+
+def item_tokens(row_index: int, text: str) -> int:
+    """Prompt tokens one item adds, as it appears in the prompt's JSON list."""
+    return estimate_tokens(json.dumps({"row_index": row_index, "text": text}, ensure_ascii=False)) + 1
+
+def batch_items(df_batch: pd.DataFrame) -> List[Dict]:
     # Prepare minimal inputs to keep token usage efficient
-    items = []
-    for row_idx, row in df_batch.iterrows():
-        # Collect text from both qna_text and qna columns
-        text_parts = []
-        
-        # Get qna_text if available
-        qna_text = str(row.get("qna_text", "") or "").strip()
-        if qna_text:
-            text_parts.append(qna_text)
-        
-        # Get qna if available (might be JSON string)
-        qna = str(row.get("qna", "") or "").strip()
-        if qna and qna != qna_text:  # Avoid duplication
-            text_parts.append(qna)
-        
-        # Combine both columns
-        text = " ".join(text_parts).strip()
-        
-        # Fallback: if text still empty, build from other columns (rare)
-        if not text:
-            parts = [
-                str(row.get("detail_naam", "")),
-                str(row.get("detail_plaats", "")),
-            ]
-            text = " ".join([p for p in parts if p]).strip()
-
-        items.append({"row_index": int(row_idx), "text": text})
-
-    prompt = build_prompt(items)
-
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=prompt,
-        config={
-            "temperature": 0.0,
-            "response_mime_type": "application/json",
-            "response_schema": list[OpinionLabel],  # Pydantic → schema sent to API
-        },
-    )
+    return [{"row_index": int(row_idx), "text": item_text(row)} for row_idx, row in df_batch.iterrows()]
+
+def pack_batches(df: pd.DataFrame, rows: List[int], fields: Sequence[str] = LABEL_COLUMNS) -> List[List[int]]:
+    """
+    Group rows (in order) into batches that fit PROMPT_TOKEN_BUDGET and RESPONSE_TOKEN_BUDGET, with at most
+    BATCH_SIZE rows each. A row too long for the budget on its own gets a batch to itself.
+    """
+    item_budget = PROMPT_TOKEN_BUDGET - estimate_tokens(build_prompt(fields, []))
+    output_per_item = output_tokens_per_item(fields)
+    max_items = max(1, min(BATCH_SIZE, RESPONSE_TOKEN_BUDGET // output_per_item))
+    batches, batch, used = [], [], 0
+    for row in rows:
+        cost = item_tokens(row, item_text(df.loc[row]))
+        if batch and (used + cost > item_budget or len(batch) >= max_items):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(row)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def output_tokens_per_item(fields: Sequence[str]) -> int:
+    """OUTPUT_TOKENS_PER_ITEM is for all fields; fewer fields give shorter answers."""
+    return max(10, OUTPUT_TOKENS_PER_ITEM * (len(fields) + 1) // (len(LABEL_COLUMNS) + 1))
+
+def generation_config(fields: Sequence[str] = LABEL_COLUMNS) -> Dict:
+    return {
+        "temperature": 0.0,
+        "response_mime_type": "application/json",
+        "response_schema": list[response_model(check_fields(fields))],  # Pydantic → schema sent to API
+    }
 
+def parse_labels(response, fields: Sequence[str] = LABEL_COLUMNS) -> List[BaseModel]:
+    """
+    Every valid label in the response. A malformed or truncated JSON array yields its complete,
+    valid objects instead of an error; invalid objects are dropped.
+    """
+    model = response_model(check_fields(fields))
     # Prefer structured parse; fallback to JSON text
-    parsed = response.parsed
-    if not parsed:
-        parsed = [OpinionLabel(**obj) for obj in json.loads(response.text)]
-    return parsed
+    parsed = getattr(response, "parsed", None)
+    if parsed:
+        return [p for p in parsed if isinstance(p, model)]
+    text = getattr(response, "text", None) or ""
+    try:
+        objects = json.loads(text)
+    except ValueError:
+        objects = salvage_objects(text)
+    labels = []
+    for obj in objects if isinstance(objects, list) else []:
+        try:
+            labels.append(model(**obj))
+        except (TypeError, ValueError):  # not an object, or fails validation
+            continue
+    return labels
+
+def salvage_objects(text: str) -> List:
+    """The JSON objects that can be decoded from broken JSON text, in order."""
+    decoder = json.JSONDecoder()
+    objects, pos = [], text.find("{")
+    while pos != -1:
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find("{", pos + 1)
+            continue
+        objects.append(obj)
+        pos = text.find("{", end)
+    return objects
+
+def cache_version(fields: Sequence[str] = LABEL_COLUMNS) -> str:
+    """Differs per prompt and per set of fields asked for, so each field set has its own cache entries."""
+    return prompt_version(build_prompt(fields, []), response_model(check_fields(fields)).model_json_schema(),
+                          PROMPT_VERSION)
+
+def split_cached(items: List[Dict], fields: Sequence[str],
+                 cache: Optional[LabelCache]) -> Tuple[List[BaseModel], List[Dict], List[Dict]]:
+    """
+    Return (labels found in the cache, items not in the cache, items to send);
+    uncached items with the same text are sent once.
+    """
+    version = cache_version(fields)
+    cached = cache.get_many(CACHE_TASK, MODEL_NAME, version, [it["text"] for it in items]) if cache else {}
+    model = response_model(check_fields(fields))
+    labels, uncached, pending, sent = [], [], [], set()
+    for it in items:
+        if it["text"] in cached:
+            labels.append(model(row_index=it["row_index"], **cached[it["text"]]))
+            continue
+        uncached.append(it)
+        if normalize_text(it["text"]) not in sent:
+            sent.add(normalize_text(it["text"]))
+            pending.append(it)
+    return labels, uncached, pending
+
+def spread_results(uncached: List[Dict], pending: List[Dict], results: List[BaseModel], fields: Sequence[str],
+                   cache: Optional[LabelCache]) -> List[BaseModel]:
+    """Cache the results for the sent items and copy each one to every uncached item with the same text."""
+    sent_text = {it["row_index"]: it["text"] for it in pending}
+    # Results for row indices we did not send are ignored
+    answered = [r for r in results if r.row_index in sent_text]
+    if cache:
+        cache.put_many(CACHE_TASK, MODEL_NAME, cache_version(fields), {
+            sent_text[r.row_index]: r.model_dump(mode="json", exclude={"row_index"}) for r in answered
+        })
+    by_text = {normalize_text(sent_text[r.row_index]): r for r in answered}
+    labels = []
+    for it in uncached:
+        r = by_text.get(normalize_text(it["text"]))
+        if r is not None:
+            labels.append(r.model_copy(update={"row_index": it["row_index"]}))
+    return labels
+
+def classify_batch(df_batch: pd.DataFrame, cache: Optional[LabelCache] = None,
+                   fields: Sequence[str] = LABEL_COLUMNS) -> Tuple[List[BaseModel], Dict[int, str]]:
+    """classify_batch_async() for a single batch, outside of label_batches()."""
+    limiter = QuotaLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, MAX_IN_FLIGHT)
+    return asyncio.run(classify_batch_async(df_batch, limiter, cache, fields))
+
+async def classify_batch_async(df_batch: pd.DataFrame, limiter: QuotaLimiter, cache: Optional[LabelCache] = None,
+                               fields: Sequence[str] = LABEL_COLUMNS) -> Tuple[List[BaseModel], Dict[int, str]]:
+    """
+    Ask for `fields` of every row of a batch, through the shared quota limiter; returns (labels, {row index: reason} for rows
+    that could not be labeled). Valid labels of a partial response are kept and only the missing rows
+    are asked again; a call that yields nothing is split in half until the bad row is alone.
+    Quota, server and timeout errors are retried and, when they persist on the first call, raised.
+    """
+    labels, uncached, pending = split_cached(batch_items(df_batch), fields, cache)
+    if not pending:
+        return labels, {}
+    failed: Dict[int, str] = {}
+    results = await label_items(pending, fields, limiter, failed, first=True)
+    # Rows that share a sent row's text share its fate
+    failed_text = {normalize_text(it["text"]): failed[it["row_index"]] for it in pending if it["row_index"] in failed}
+    unlabelable = {it["row_index"]: failed_text[normalize_text(it["text"])] for it in uncached
+                   if normalize_text(it["text"]) in failed_text}
+    return labels + spread_results(uncached, pending, results, fields, cache), unlabelable
 
-def save_stance_column(df: pd.DataFrame):
-    """Save the entire dataframe (with stance column) back to the original CSV."""
-    df.to_csv(CSV_PATH_IN, index=False)
+async def request_labels(items: List[Dict], fields: Sequence[str], limiter: QuotaLimiter) -> List[BaseModel]:
+    """One call for items, retrying quota, server and timeout errors; returns the valid labels for these items."""
+    prompt = build_prompt(fields, items)
+    estimated = estimate_tokens(prompt) + output_tokens_per_item(fields) * len(items)
+    sent = {it["row_index"] for it in items}
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            async with limiter.call(estimated):
+                response = await get_client().aio.models.generate_content(
+                    model=MODEL_NAME, contents=prompt, config=generation_config(fields))
+            usage = getattr(response, "usage_metadata", None)
+            limiter.settle(estimated, getattr(usage, "total_token_count", None))
+            # Results for row indices we did not send are ignored
+            return [r for r in parse_labels(response, fields) if r.row_index in sent]
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS or not is_transient_error(e):
+                raise
+            print(f"    ! Call for {len(items)} rows (from row {items[0]['row_index']}) attempt {attempt}/{MAX_ATTEMPTS} failed: "
+                  f"{describe_error(e)}")
+            # Quota errors already paused every call in the limiter
+            if not is_quota_error(e):
+                await asyncio.sleep(backoff_delay(attempt))
+
+async def label_items(items: List[Dict], fields: Sequence[str], limiter: QuotaLimiter, failed: Dict[int, str],
+                      first: bool = False) -> List[BaseModel]:
+    """
+    Labels for items, asking again for rows a response left out and bisecting calls that yield nothing
+    or are rejected for their content (400 INVALID_ARGUMENT); a single row that still yields nothing goes
+    to `failed`. Persistent transient errors are raised from the first call and otherwise leave the rows
+    unlabeled (and not failed) for the next run. Any other error (auth, permission, configuration) says
+    nothing about the rows and is raised.
+    """
+    try:
+        labels = await request_labels(items, fields, limiter)
+        error = "no valid label in the response"
+    except Exception as e:
+        if is_transient_error(e):
+            if first:
+                raise
+            print(f"    ! {len(items)} rows left for the next run: {describe_error(e)}")
+            return []
+        if not is_row_error(e):
+            raise
+        labels, error = [], describe_error(e)
+    answered = {r.row_index for r in labels}
+    missing = [it for it in items if it["row_index"] not in answered]
+    if not missing:
+        return labels
+    if labels:
+        # A partial answer (e.g. cut off at the output limit): only the rest is asked again
+        print(f"    ~ Kept {len(answered)} labels of a partial response; asking again for {len(missing)} rows")
+        return labels + await label_items(missing, fields, limiter, failed)
+    if len(items) == 1:
+        failed[items[0]["row_index"]] = error
+        print(f"    ✗ Row {items[0]['row_index']} could not be labeled: {error}")
+        return []
+    half = len(items) // 2
+    print(f"    ~ Call for {len(items)} rows yielded no labels ({error}); splitting it in half")
+    first_half, second_half = await asyncio.gather(label_items(items[:half], fields, limiter, failed),
+                                                   label_items(items[half:], fields, limiter, failed))
+    return first_half + second_half
+
+def apply_labels(df: pd.DataFrame, df_batch: pd.DataFrame, results: List[BaseModel],
+                 fields: Sequence[str] = LABEL_COLUMNS) -> List[int]:
+    """Write results into their rows; returns the row indices written (IDs outside the batch are ignored)."""
+    written = []
+    for r in results:
+        if r.row_index not in df_batch.index:
+            continue
+        for field in fields:
+            df.at[r.row_index, field] = getattr(r, field).value
+            df.at[r.row_index, source_column(field)] = "llm"
+        written.append(r.row_index)
+    clear_label_errors(df, written)
+    return written
+
+def clear_label_errors(df: pd.DataFrame, rows: List[int]) -> None:
+    """Mark the earlier label_error of rows that have now been labeled as cleared."""
+    if LABEL_ERROR_COLUMN not in df.columns or not rows:
+        return
+    errors = df.loc[rows, LABEL_ERROR_COLUMN]
+    # A missing value would not replace the stored error when saved; CLEARED does
+    df.loc[errors[errors.notna()].index, LABEL_ERROR_COLUMN] = CLEARED
+
+def journal_rows(df: pd.DataFrame, rows: List[int], fields: Sequence[str], source: str):
+    """
+    Append the `fields` the given rows were just labeled with by `source`, their source columns and
+    label_error to the label journal (merged into the dataset store by run()).
+    """
+    if rows:
+        columns = list(fields) + [source_column(field) for field in fields] + [LABEL_ERROR_COLUMN]
+        # LLM labels are journaled with the model that gave them, others with their source ("local", "cluster")
+        journal_labels(df.loc[rows], columns, MODEL_NAME if source == "llm" else source)
 
 def main():
-    df = pd.read_csv(CSV_PATH_IN)
+    parser = argparse.ArgumentParser(description="Label the reactions in the dataset store with Gemini")
+    parser.add_argument("--fields", default=",".join(LABEL_COLUMNS),
+                        help=f"comma-separated label fields (default: {','.join(LABEL_COLUMNS)})")
+    parser.add_argument("--where", metavar="EXPR",
+                        help='only rows matching this filter, e.g. \'language == "Other"\' or "stance is null"')
+    parser.add_argument("--relabel", action="store_true",
+                        help="ask for the fields of every selected row, not only the missing ones")
+    args = parser.parse_args()
+    try:
+        fields = check_fields([f.strip() for f in args.fields.split(",") if f.strip()])
+        # A filter that cannot be evaluated is reported before anything is labeled
+        select_rows(add_label_columns(read_dataset()), args.where)
+    except ValueError as e:
+        parser.error(str(e))
+    run(fields, args.where, args.relabel)
+
+def run(fields: Sequence[str] = LABEL_COLUMNS, where: Optional[str] = None, relabel: bool = False, client=None):
+    """
+    Label `fields` of the rows matching `where`: the missing ones, or all of them with relabel.
+    `client` replaces the Gemini client (see set_client()).
+    """
+    if client is not None:
+        set_client(client)
+    # Labels journaled by a run that crashed are merged before planning, so they are not paid for again
+    recovered = merge_journal()
+    if recovered:
+        print(f"Merged journaled labels of {recovered} rows left by an earlier run from {JOURNAL_PATH}")
+    try:
+        label_dataset(check_fields(fields), where, relabel)
+    finally:
+        merged = merge_journal()
+        if merged:
+            print(f"Merged labels of {merged} rows from {JOURNAL_PATH} into {DATASET_DIR}")
+
+def add_label_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Create the label, label source and label_error columns df does not have yet; returns df."""
+    for column in LABEL_COLUMNS:
+        if column not in df.columns:
+            df[column] = pd.NA
+    for column in list(map(source_column, LABEL_COLUMNS)) + [LABEL_ERROR_COLUMN]:
+        if column not in df.columns:
+            df[column] = None
+    return df
+
+def label_dataset(fields: Tuple[str, ...], where: Optional[str], relabel: bool):
+    df = read_dataset()
     
-    # Initialize or reset columns based on START_FRESH setting
     if START_FRESH:
-        print("Starting fresh - clearing all previous classifications...")
-        df["stance"] = pd.NA
-        df["language"] = pd.NA
-        df["identifies_as_immigrant"] = pd.NA
-        start_from = 0
-    else:
-        # Create columns if they don't exist
-        if "stance" not in df.columns:
-            df["stance"] = pd.NA
-        if "language" not in df.columns:
-            df["language"] = pd.NA
-        if "identifies_as_immigrant" not in df.columns:
-            df["identifies_as_immigrant"] = pd.NA
-        
-        # Find where to resume from (first row without a stance)
-        start_from = 0
-        if df["stance"].notna().any():
-            # Find the first NA value after any filled values
-            filled_count = df["stance"].notna().sum()
-            start_from = filled_count
-            print(f"Resuming from row {start_from} ({filled_count} already processed)")
-        else:
-            print("No previous progress found - starting from beginning...")
+        for column in fields:
+            # Stored labels are append-only: new labels supersede the old ones as they are saved
+            df[column] = pd.NA
+        print(f"Starting fresh - clearing all previous {', '.join(fields)} labels...")
+    add_label_columns(df)
 
     n = len(df)
     if n == 0:
-        print("No rows found in CSV.")
+        print(f"No rows found in {DATASET_DIR}.")
         return
-    
-    print(f"Classifying {n} opinions in batches of {BATCH_SIZE}...")
 
-    batch_count = 0
-    for start, end in chunk_indices(n, BATCH_SIZE):
-        # Skip already processed batches
-        if end <= start_from:
+    # Only rows (by detail_relative) missing any label are sent, wherever they are in the table
+    selected = select_rows(df, where)
+    if where:
+        print(f"Filter {where!r} selects {int(selected.sum())} of {n} rows")
+    if not RETRY_UNLABELABLE:
+        skipped = selected & df[LABEL_ERROR_COLUMN].notna() & (df[LABEL_ERROR_COLUMN] != CLEARED)
+        if skipped.any():
+            print(f"Skipping {int(skipped.sum())} rows that could not be labeled before (RETRY_UNLABELABLE is off)")
+        selected &= ~skipped
+    plan = plan_labeling(df, list(fields), selected, relabel)
+    print(f"Plan: {plan.describe()}")
+    if not len(plan):
+        print("Nothing to label.")
+        return
+    row_of = dict(zip(df[KEY], df.index))
+    # Rows whose current labels are being replaced cannot lend them to near-duplicates
+    stale = {row_of[key] for key in plan.keys}
+    if USE_NEAR_DUPLICATES:
+        assign_clusters(df)
+    # Rows missing the same fields share prompts; each prompt asks for exactly those fields
+    batches: List[Tuple[Tuple[str, ...], List[int]]] = []
+    followers: List[Tuple[Tuple[str, ...], List[int]]] = []
+    for asked, keys in plan.groups().items():
+        rows = [row_of[key] for key in keys]
+        print(f"{len(rows)} rows need {', '.join(asked)}")
+        if USE_NEAR_DUPLICATES:
+            # Near-duplicates of labeled rows take their labels; of the rest, one row per cluster is labeled
+            left = copy_cluster_labels(df, rows, asked, stale)
+            stale -= set(rows) - set(left)
+            rows, group_followers = pick_representatives(df, left)
+            followers.append((asked, group_followers))
+        if USE_LOCAL_CLASSIFIER and rows:
+            left = label_locally(df, rows, asked)
+            stale -= set(rows) - set(left)
+            rows = left
+        batches += [(asked, batch) for batch in pack_batches(df, rows, asked)]
+    if batches:
+        n_rows = sum(len(batch) for _, batch in batches)
+        print(f"Classifying {n_rows} opinions in {len(batches)} batches "
+              f"(~{n_rows / len(batches):.0f} rows per call, at most {PROMPT_TOKEN_BUDGET} prompt tokens), "
+              f"up to {MAX_IN_FLIGHT} in flight...")
+        cache = LabelCache(CACHE_DB) if USE_CACHE else None
+        try:
+            stale -= set(asyncio.run(label_batches(df, batches, cache)))
+        finally:
+            if cache is not None:
+                print(f"Label cache: {cache.describe()}")
+                cache.close()
+    for asked, group_followers in followers:
+        if group_followers:
+            # Followers of a representative whose batch failed stay unlabeled for the next run
+            copy_cluster_labels(df, group_followers, asked, stale)
+    print(f"Done. Saved labeled data to: {DATASET_DIR}")
+
+def assign_clusters(df: pd.DataFrame) -> None:
+    """Index new rows in the near-duplicate index, set df's cluster_id column and save the ones that changed."""
+    stored = df[CLUSTER_COLUMN] if CLUSTER_COLUMN in df.columns else pd.Series(None, index=df.index, dtype=object)
+    with NearDuplicateIndex(NEAR_DUPLICATE_DB) as index:
+        added = index.update(zip(df[KEY], row_texts(df)))
+        df[CLUSTER_COLUMN] = df[KEY].map(index.clusters)
+        sizes = index.sizes()
+    changed = df[CLUSTER_COLUMN].notna() & (df[CLUSTER_COLUMN] != stored)
+    if changed.any():
+        append_labels(df[changed], [CLUSTER_COLUMN])
+    campaigns = sorted((n for n in sizes.values() if n > 1), reverse=True)
+    print(f"Near-duplicates: {len(added)} new rows indexed; {sum(campaigns)} rows in {len(campaigns)} clusters "
+          f"of 2 or more (largest: {campaigns[:5]})")
+
+def copy_cluster_labels(df: pd.DataFrame, rows: List[int], fields: Sequence[str] = LABEL_COLUMNS,
+                        stale: Optional[set] = None) -> List[int]:
+    """
+    Give rows the `fields` of a row in their cluster that has them all (preferring LLM labels) and is not
+    in `stale`; returns the rows left.
+    """
+    fields = list(fields)
+    usable = df[fields].notna().all(axis=1) & df[CLUSTER_COLUMN].notna()
+    if stale:
+        usable &= ~df.index.isin(list(stale))
+    labeled = df[usable]
+    sources = [field_source(labeled, field) for field in fields]
+    labeled = labeled.assign(_llm=pd.concat([s.isna() | (s == "llm") for s in sources], axis=1).all(axis=1))
+    donors = labeled.sort_values("_llm", ascending=False, kind="stable").drop_duplicates(CLUSTER_COLUMN)
+    donor_of = dict(zip(donors[CLUSTER_COLUMN], donors.index))
+    copied, left = [], []
+    for row in rows:
+        donor = donor_of.get(df.at[row, CLUSTER_COLUMN])
+        if donor is None or donor == row:
+            left.append(row)
             continue
-            
-        batch = df.iloc[start:end]
-        results = classify_batch(batch)
-
-        # Write results back into dataframe
-        for r in results:
-            df.at[r.row_index, "stance"] = r.label.value
-            df.at[r.row_index, "language"] = r.language.value
-            df.at[r.row_index, "identifies_as_immigrant"] = r.identifies_as_immigrant.value
-
-        print(f"Processed rows {start}–{end-1} ({end}/{n}).")
-        
-        batch_count += 1
-        
-        # Save at regular intervals
-        if batch_count % SAVE_INTERVAL == 0:
-            save_stance_column(df)
-            print(f"Progress saved to {CSV_PATH_IN}")
-        
-        # Sleep between batches to avoid rate limiting
-        if end < n:  # Don't sleep after the last batch
-            time.sleep(SLEEP_TIME)
-
-    # Final save
-    save_stance_column(df)
-    print(f"Done. Saved labeled data to: {CSV_PATH_IN}")
+        for column in fields:
+            df.at[row, column] = df.at[donor, column]
+            df.at[row, source_column(column)] = "cluster"
+        copied.append(row)
+    clear_label_errors(df, copied)
+    journal_rows(df, copied, fields, "cluster")
+    if copied:
+        print(f"Copied labels to {len(copied)} near-duplicate rows from labeled rows in their cluster")
+    return left
+
+def pick_representatives(df: pd.DataFrame, rows: List[int]) -> Tuple[List[int], List[int]]:
+    """Split rows into (the first row of each cluster, the other rows); rows without a cluster are their own."""
+    representatives, followers, seen = [], [], set()
+    for row in rows:
+        cluster = df.at[row, CLUSTER_COLUMN]
+        if pd.isna(cluster):
+            representatives.append(row)
+        elif cluster in seen:
+            followers.append(row)
+        else:
+            seen.add(cluster)
+            representatives.append(row)
+    if followers:
+        print(f"Labeling {len(representatives)} representatives; {len(followers)} near-duplicates will copy their labels")
+    return representatives, followers
+
+def local_classifier(df: pd.DataFrame) -> Optional[LocalClassifier]:
+    """The saved local classifier, retrained from the LLM labels in df when missing or stale."""
+    if not local_classifier_available():
+        print("Local classifier: scikit-learn is not installed; every row goes to Gemini")
+        return None
+    classifier = LocalClassifier.load()
+    if classifier is not None and classifier.age_days() < RETRAIN_AFTER_DAYS:
+        return classifier
+    print("Training the local classifier from the LLM labels...")
+    models, report = train_local_classifier(df)
+    if not models:
+        return classifier
+    classifier = LocalClassifier(models, report)
+    classifier.save()
+    print_report(report)
+    return classifier
+
+def label_locally(df: pd.DataFrame, rows: List[int], fields: Sequence[str] = LABEL_COLUMNS) -> List[int]:
+    """
+    Label the rows every local model is confident about for `fields` (stance and immigrant status from the
+    local classifier, language from the offline detector) and save them; returns the rows left for Gemini.
+    """
+    model_fields = [f for f in fields if f != "language"]
+    classifier = local_classifier(df) if model_fields else None
+    # A row skips Gemini only when all its asked fields can be given locally
+    if model_fields and (classifier is None or not set(model_fields) <= set(classifier.fields)):
+        return rows
+    texts = row_texts(df.loc[rows])
+    predictions = {}
+    confident = np.ones(len(rows), dtype=bool)
+    if "language" in fields:
+        predictions["language"], confidence = detect_language(texts)
+        confident &= confidence >= LANGUAGE_MIN_CONFIDENCE
+        df.loc[rows, LANGUAGE_CONFIDENCE_COLUMN] = [f"{c:.3f}" for c in confidence]
+        # Kept for every checked row, also those whose language is left to Gemini
+        journal_labels(df.loc[rows], [LANGUAGE_CONFIDENCE_COLUMN], "lang_id")
+    for field in model_fields:
+        predictions[field], confidence = classifier.predict(field, texts)
+        confident &= confidence >= LOCAL_MIN_CONFIDENCE
+    local_rows = [row for row, ok in zip(rows, confident) if ok]
+    for field, values in predictions.items():
+        df.loc[local_rows, field] = [v for v, ok in zip(values, confident) if ok]
+        df.loc[local_rows, source_column(field)] = "local"
+    clear_label_errors(df, local_rows)
+    journal_rows(df, local_rows, list(predictions), "local")
+    print(f"Local classifier labeled {len(local_rows)} of {len(rows)} rows; {len(rows) - len(local_rows)} go to Gemini")
+    return [row for row, ok in zip(rows, confident) if not ok]
+
+async def label_batches(df: pd.DataFrame, batches: List[Tuple[Tuple[str, ...], List[int]]],
+                        cache: Optional[LabelCache] = None) -> List[int]:
+    """
+    Classify the given (fields, row indices) batches concurrently, journaling labels as batches complete;
+    returns the rows labeled.
+    """
+    limiter = QuotaLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, MAX_IN_FLIGHT)
+
+    async def run(fields: Tuple[str, ...], rows: List[int]):
+        try:
+            results, unlabelable = await classify_batch_async(df.loc[rows], limiter, cache, fields)
+            return fields, rows, results, unlabelable, None
+        except Exception as e:
+            return fields, rows, None, None, e
+
+    # The limiter decides how many of these are in flight
+    tasks = [asyncio.create_task(run(fields, rows)) for fields, rows in batches]
+    labeled: List[int] = []
+    done, failed, marked = 0, 0, 0
+    started = time.time()
+    for next_done in asyncio.as_completed(tasks):
+        fields, rows, results, unlabelable, error = await next_done
+        done += 1
+        if error is not None:
+            if not is_transient_error(error) and not is_row_error(error):
+                # Every other call would fail the same way (e.g. a bad API key): stop instead of marking rows
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                print(f"  ✗ Labeling stopped: {describe_error(error)}")
+                raise error
+            failed += 1
+            print(f"  ✗ Batch of {len(rows)} rows failed, left unlabeled for the next run: {describe_error(error)}")
+            continue
+        written = apply_labels(df, df.loc[rows], results, fields)
+        labeled += written
+        for row, reason in unlabelable.items():
+            df.at[row, LABEL_ERROR_COLUMN] = reason
+        marked += len(unlabelable)
+        # Every batch goes to the journal as soon as it is done; a crash loses at most the batches in flight
+        journal_rows(df, written, fields, "llm")
+        journal_rows(df, list(unlabelable), [], "llm")
+        print(f"Processed {len(rows)} rows ({done}/{len(batches)} batches, "
+              f"{done / max(time.time() - started, 1e-9) * 60:.0f} batches/min).")
+
+    print(f"Quota limiter: {limiter.describe()}; {failed} batches failed; {marked} rows could not be labeled "
+          f"(see {LABEL_ERROR_COLUMN})")
+    return labeled
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Labeling benchmark: run analytics.py against fake_gemini.py and report rows/sec,
+API calls per 1k rows, estimated tokens and cost per row, and wall-clock time
+for each concurrency.
+
+Every run labels a fresh temporary copy of the same synthetic dataset (--rows
+reactions built from mock_server.py's sentences, with --duplicate-share exact
+copies like campaign submissions), so runs compare. The label cache,
+near-duplicate index and journal start empty in each run.
+
+    python benchmark_labeling.py --rows 2000 --concurrency 1,4,8,16
+    python benchmark_labeling.py --rows 2000 --quota-rate 0.02 --malformed-rate 0.01 --error-rate 0.01
+    python benchmark_labeling.py --rows 2000 --no-cache --no-near-duplicates --json bench.json
+
+Fake backend options (--latency-ms, --quota-rate, --server-rpm, ...) go to FakeClient.
+Token counts are estimates (about four characters per token), as quota_limiter uses.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import analytics
+from dataset_store import append_rows, read_dataset
+from fake_gemini import FakeClient
+from mock_server import QUESTIONS, SENTENCES
+
+# USD per 1M tokens for MODEL_NAME (gemini-2.5-flash list prices when this was written; check current pricing)
+PRICE_INPUT_PER_M = 0.30
+PRICE_OUTPUT_PER_M = 2.50
+FAKE_OPTIONS = ["latency_ms", "jitter_ms", "ms_per_item", "error_rate", "quota_rate", "malformed_rate",
+                "drop_rate", "seed"]
+
+
+def synthetic_rows(n: int, duplicate_share: float, seed: int) -> List[Dict]:
+    """n reactions with answers to the consultation questions; duplicate_share of them repeat an earlier text."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        if rows and rng.random() < duplicate_share:
+            text = rng.choice(rows)["qna_text"]
+        else:
+            text = " ".join(
+                f"{q} {' '.join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 8)))}" for q in QUESTIONS
+            )
+        rows.append({"detail_relative": f"/bench/reactie/{i}", "qna_text": text, "detail_naam": f"Inzender {i}"})
+    return rows
+
+
+def configure_analytics(args: argparse.Namespace, concurrency: int) -> None:
+    analytics.MAX_IN_FLIGHT = concurrency
+    analytics.REQUESTS_PER_MINUTE = args.rpm
+    analytics.TOKENS_PER_MINUTE = args.tpm
+    analytics.USE_CACHE = not args.no_cache
+    analytics.USE_NEAR_DUPLICATES = not args.no_near_duplicates
+    # A fresh dataset has no LLM labels to train the local classifier on
+    analytics.USE_LOCAL_CLASSIFIER = False
+    if args.batch_size:
+        analytics.BATCH_SIZE = args.batch_size
+
+
+def run_once(args: argparse.Namespace, concurrency: int, rows: List[Dict]) -> Dict:
+    """Label a fresh copy of rows with `concurrency` calls in flight; returns the measurements."""
+    configure_analytics(args, concurrency)
+    client = FakeClient(requests_per_minute=args.server_rpm, **{name: getattr(args, name) for name in FAKE_OPTIONS})
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="labeling-bench-") as workdir:
+            os.chdir(workdir)
+            append_rows(rows)
+            with open(os.devnull, "w") as devnull:
+                quiet = contextlib.ExitStack()
+                if not args.verbose:
+                    quiet.enter_context(contextlib.redirect_stdout(devnull))
+                with quiet:
+                    started = time.perf_counter()
+                    analytics.run(client=client)
+                    wall = time.perf_counter() - started
+            df = read_dataset()
+            labeled = int(df[analytics.LABEL_COLUMNS].notna().all(axis=1).sum())
+    finally:
+        os.chdir(cwd)
+        analytics.set_client(None)
+    stats = client.stats
+    n = len(rows)
+    prompt_tokens, output_tokens = stats["prompt_tokens"], stats["output_tokens"]
+    cost = (prompt_tokens * PRICE_INPUT_PER_M + output_tokens * PRICE_OUTPUT_PER_M) / 1e6
+    return {
+        "concurrency": concurrency,
+        "rows": n,
+        "labeled": labeled,
+        "wall_s": round(wall, 2),
+        "rows_per_s": round(n / wall, 1) if wall else None,
+        "calls": stats["calls"],
+        "calls_per_1k_rows": round(stats["calls"] * 1000 / n, 1),
+        "prompt_tokens_per_row": round(prompt_tokens / n, 1),
+        "output_tokens_per_row": round(output_tokens / n, 1),
+        "cost_per_1k_rows_usd": round(cost * 1000 / n, 4),
+        "quota_errors": stats["quota_errors"],
+        "server_errors": stats["server_errors"],
+        "malformed": stats["malformed"],
+    }
+
+
+def print_results(results: List[Dict]) -> None:
+    print(f"{'in flight':>9} {'wall s':>8} {'rows/s':>8} {'calls/1k':>9} {'prompt tok/row':>15} "
+          f"{'output tok/row':>15} {'$ per 1k':>9} {'429s':>5} {'5xx':>5} {'bad json':>8} {'unlabeled':>9}")
+    for r in results:
+        print(f"{r['concurrency']:>9} {r['wall_s']:>8.2f} {r['rows_per_s']:>8.1f} {r['calls_per_1k_rows']:>9.1f} "
+              f"{r['prompt_tokens_per_row']:>15.1f} {r['output_tokens_per_row']:>15.1f} "
+              f"{r['cost_per_1k_rows_usd']:>9.4f} {r['quota_errors']:>5} {r['server_errors']:>5} "
+              f"{r['malformed']:>8} {r['rows'] - r['labeled']:>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark analytics.py against the fake Gemini backend")
+    parser.add_argument("--rows", type=int, default=1000, help="synthetic reactions to label (default 1000)")
+    parser.add_argument("--duplicate-share", type=float, default=0.1,
+                        help="share of rows repeating an earlier text (default 0.1)")
+    parser.add_argument("--concurrency", default="1,4,8",
+                        help="comma-separated MAX_IN_FLIGHT values to run (default 1,4,8)")
+    parser.add_argument("--rpm", type=int, default=analytics.REQUESTS_PER_MINUTE,
+                        help=f"client-side REQUESTS_PER_MINUTE (default {analytics.REQUESTS_PER_MINUTE})")
+    parser.add_argument("--tpm", type=int, default=analytics.TOKENS_PER_MINUTE,
+                        help=f"client-side TOKENS_PER_MINUTE (default {analytics.TOKENS_PER_MINUTE})")
+    parser.add_argument("--batch-size", type=int, default=0, help="override BATCH_SIZE")
+    parser.add_argument("--no-cache", action="store_true", help="label without the label cache")
+    parser.add_argument("--no-near-duplicates", action="store_true", help="label every near-duplicate")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="fake call latency (default 500)")
+    parser.add_argument("--jitter-ms", type=float, default=200.0, help="fake latency jitter (default 200)")
+    parser.add_argument("--ms-per-item", type=float, default=20.0, help="fake latency per item (default 20)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with 503")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="share of calls failing with 429")
+    parser.add_argument("--server-rpm", type=int, default=0, help="fake server-side requests per minute (0: none)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of answers cut off mid-array")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of items left out of answers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show analytics.py's own output")
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.duplicate_share, args.seed)
+    results = []
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        print(f"Labeling {len(rows)} rows with up to {concurrency} calls in flight...", file=sys.stderr)
+        results.append(run_once(args, concurrency, rows))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Saved {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
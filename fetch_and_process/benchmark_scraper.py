@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark: run main_batched.py against mock_server.py and report
+items/sec, p50/p99 fetch latency and CPU time per item.
+
+The mock server runs in its own process so its CPU time is not counted. The
+scraper runs in this process against a fresh temporary data directory, so every
+run fetches all --items reactions.
+
+    python benchmark_scraper.py --items 2000 --throttle-rate 0.02
+    python benchmark_scraper.py --items 2000 --json bench.json          # save the result
+    python benchmark_scraper.py --items 2000 --baseline bench.json      # exit 1 on a regression
+
+Mock server options (--latency-ms, --error-rate, --burst-every, ...) are passed through.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+import main_batched
+from html_parsers import get_parser
+from mock_server import build_arg_parser as mock_arg_parser
+from scrape_metrics import ScrapeMetrics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MOCK_OPTIONS = ["items", "slug", "latency_ms", "jitter_ms", "error_rate", "throttle_rate",
+                "burst_every", "burst_length", "retry_after", "seed"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    cmd = [sys.executable, os.path.join(HERE, "mock_server.py"), "--port", str(port)]
+    for name in MOCK_OPTIONS:
+        cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("mock server did not start")
+
+
+def server_stats(port: int) -> Dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats") as resp:
+        return json.load(resp)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def cpu_seconds() -> float:
+    # Parse workers are child processes; they are reaped (and counted) when the pool shuts down
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def configure_scraper(args: argparse.Namespace, port: int) -> None:
+    main_batched.BASE = f"http://127.0.0.1:{port}"
+    main_batched.ARCHIVE_HTML = args.archive
+    if args.max_concurrency:
+        main_batched.MAX_CONCURRENCY = args.max_concurrency
+        main_batched.INITIAL_CONCURRENCY = min(main_batched.INITIAL_CONCURRENCY, args.max_concurrency)
+    if args.parser:
+        main_batched.PARSER_BACKEND = args.parser
+        main_batched.PARSER = get_parser(args.parser)
+    if args.parse_workers is not None:
+        main_batched.PARSE_WORKERS = args.parse_workers
+    if args.parse_executor:
+        main_batched.PARSE_EXECUTOR = args.parse_executor
+
+
+def run_scraper(slug: str, verbose: bool) -> Tuple[List[float], ScrapeMetrics]:
+    """Run one scrape in the current directory; returns every HTTP fetch's latency in seconds and the run metrics."""
+    latencies: List[float] = []
+    fetch = main_batched.fetch
+
+    # Exact per-request latencies; the run metrics only keep bucketed histograms
+    async def timed_fetch(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fetch(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    main_batched.fetch = timed_fetch
+    try:
+        with open(os.devnull, "w") as devnull:
+            quiet = contextlib.ExitStack()
+            if not verbose:
+                quiet.enter_context(contextlib.redirect_stdout(devnull))
+                quiet.enter_context(contextlib.redirect_stderr(devnull))
+            with quiet:
+                metrics = asyncio.run(main_batched.main_async([slug]))
+    finally:
+        main_batched.fetch = fetch
+    return latencies, metrics
+
+
+def benchmark(args: argparse.Namespace) -> Dict:
+    port = args.port or free_port()
+    configure_scraper(args, port)
+    server = start_mock_server(args, port)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="scraper-bench-") as workdir:
+            os.chdir(workdir)
+            os.makedirs("data", exist_ok=True)
+            cpu_before, started = cpu_seconds(), time.perf_counter()
+            latencies, metrics = run_scraper(args.slug, args.verbose)
+            wall, cpu = time.perf_counter() - started, cpu_seconds() - cpu_before
+            with open(main_batched.Consultation.for_slug(args.slug).jsonl_path, "r", encoding="utf-8") as f:
+                items = sum(1 for line in f if line.strip())
+            os.chdir(cwd)
+        statuses = server_stats(port)
+    finally:
+        os.chdir(cwd)
+        server.terminate()
+        server.wait()
+
+    return {
+        "items": items,
+        "wall_seconds": round(wall, 3),
+        "items_per_sec": round(items / wall, 2) if wall else 0.0,
+        "requests": len(latencies),
+        "fetch_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "fetch_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "cpu_ms_per_item": round(cpu / items * 1000, 3) if items else 0.0,
+        "parse_p50_ms": round(metrics.parse["detail"].quantile(0.5) * 1000, 2) if "detail" in metrics.parse else 0.0,
+        "slot_wait_seconds": round(metrics.slot_wait.sum, 2),
+        "retries": metrics.retries,
+        "server_statuses": statuses,
+        "config": {
+            "max_concurrency": main_batched.MAX_CONCURRENCY,
+            "parser": main_batched.PARSER.name,
+            "parse_workers": main_batched.PARSE_WORKERS,
+            "parse_executor": main_batched.PARSE_EXECUTOR,
+            "archive": main_batched.ARCHIVE_HTML,
+            **{name: getattr(args, name) for name in MOCK_OPTIONS},
+        },
+    }
+
+
+def check_regression(result: Dict, baseline_path: str, tolerance: float) -> bool:
+    """Compare against a saved result; return True when throughput or CPU per item got worse than tolerance."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressed = False
+    if result["items_per_sec"] < baseline["items_per_sec"] * (1 - tolerance):
+        print(f"✗ items/sec regressed: {result['items_per_sec']} vs baseline {baseline['items_per_sec']}")
+        regressed = True
+    if result["cpu_ms_per_item"] > baseline["cpu_ms_per_item"] * (1 + tolerance):
+        print(f"✗ CPU per item regressed: {result['cpu_ms_per_item']} ms vs baseline {baseline['cpu_ms_per_item']} ms")
+        regressed = True
+    if not regressed:
+        print(f"✓ within {tolerance:.0%} of baseline {baseline_path}")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark main_batched.py against the local mock server",
+                                     parents=[mock_arg_parser()], add_help=False, conflict_handler="resolve")
+    parser.add_argument("-h", "--help", action="help")
+    parser.add_argument("--port", type=int, default=0, help="mock server port (default: a free port)")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="override MAX_CONCURRENCY")
+    parser.add_argument("--parser", choices=["auto", "lxml", "bs4"], help="override PARSER_BACKEND")
+    parser.add_argument("--parse-workers", type=int, help="override PARSE_WORKERS")
+    parser.add_argument("--parse-executor", choices=["process", "thread"], help="override PARSE_EXECUTOR")
+    parser.add_argument("--archive", action="store_true", help="archive fetched pages, as main_batched.py --archive")
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("--baseline", help="compare against a result saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (default 0.10)")
+    parser.add_argument("--verbose", action="store_true", help="show the scraper's own output")
+    args = parser.parse_args()
+
+    result = benchmark(args)
+    print(f"Items:          {result['items']} in {result['wall_seconds']:.2f}s")
+    print(f"Throughput:     {result['items_per_sec']:.1f} items/sec")
+    print(f"Fetch latency:  p50 {result['fetch_p50_ms']:.1f} ms, p99 {result['fetch_p99_ms']:.1f} ms "
+          f"({result['requests']} requests)")
+    print(f"CPU per item:   {result['cpu_ms_per_item']:.2f} ms (detail parse p50 {result['parse_p50_ms']:.2f} ms)")
+    print(f"Slot wait:      {result['slot_wait_seconds']:.1f}s total, {result['retries']} retries")
+    print(f"Server replies: {result['server_statuses']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved result to {args.json}")
+    if args.baseline and check_regression(result, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only, date-partitioned Parquet store for scraped reactions and their labels.
+
+Layout under DATASET_DIR:
+    rows/dt=YYYY-MM-DD/part-<timestamp>-<id>.parquet     scraped rows (ROW_COLUMNS)
+    labels/dt=YYYY-MM-DD/part-<timestamp>-<id>.parquet   label updates keyed by detail_relative
+
+Files are never modified after they are written, so a daily run only writes its
+own new rows. read_dataset() presents everything as one table: the latest row
+per detail_relative, with the latest non-empty value of every label column.
+Missing values never overwrite a label; writing CLEARED (an empty string)
+does, and reads back as missing.
+
+    python dataset_store.py compact      # merge each day's small part files
+    python dataset_store.py export OUT   # write the combined table as one CSV
+"""
+
+import glob
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+DATASET_DIR = "data/reacties"
+LEGACY_CSV = "data/natur_reacties_full.csv"  # imported once when the store is first used
+
+KEY = "detail_relative"
+CLEARED = ""  # Label value that erases the earlier values of its column
+ROW_COLUMNS = [
+    "list_name", "list_place", "list_date_time",
+    "detail_relative", "detail_url",
+    "detail_naam", "detail_plaats", "detail_datum",
+    "qna_count", "qna_text", "raw_html_length"
+]
+
+
+def _part_files(dataset_dir: str, table: str) -> List[str]:
+    # dt=YYYY-MM-DD directories and timestamped part names both sort chronologically
+    return sorted(glob.glob(os.path.join(dataset_dir, table, "dt=*", "part-*.parquet")))
+
+
+def _write_part(df: pd.DataFrame, dataset_dir: str, table: str, dt: Optional[str] = None) -> str:
+    now = datetime.now(timezone.utc)
+    dt = dt or now.strftime("%Y-%m-%d")
+    name = f"part-{now.strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+    path = os.path.join(dataset_dir, table, f"dt={dt}", name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def _read_parts(paths: List[str]) -> pd.DataFrame:
+    frames = [pd.read_parquet(p) for p in paths]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def _rows_frame(records: Iterable[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame([{k: r.get(k) for k in ROW_COLUMNS} for r in records], columns=ROW_COLUMNS)
+    for col in ("qna_count", "raw_html_length"):
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    return df
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+def append_rows(records: Iterable[Dict], dataset_dir: str = DATASET_DIR) -> Optional[str]:
+    """Write scraped rows as a new immutable part in today's partition; returns its path."""
+    ensure_migrated(dataset_dir)
+    df = _rows_frame(records)
+    if df.empty:
+        return None
+    return _write_part(df, dataset_dir, "rows")
+
+
+def replace_rows(records: Iterable[Dict], dataset_dir: str = DATASET_DIR) -> Optional[str]:
+    """
+    Replace the scraped rows of the given IDs and keep every other row (used by replay, which may
+    only cover part of the store). Replaced rows keep their position. Label parts are keyed by ID
+    and are kept.
+    """
+    ensure_migrated(dataset_dir)
+    replayed = _rows_frame(records).drop_duplicates(KEY, keep="last")
+    if replayed.empty:
+        return None
+    old_parts = _part_files(dataset_dir, "rows")
+    current = read_rows(dataset_dir)
+    position = dict(zip(current[KEY], range(len(current))))
+    replayed["_order"] = [position.get(key, len(current) + i) for i, key in enumerate(replayed[KEY])]
+    kept = current.assign(_order=range(len(current)))[~current[KEY].isin(replayed[KEY])]
+    frames = [f for f in (kept, replayed) if not f.empty]
+    merged = pd.concat(frames, ignore_index=True).sort_values("_order", kind="stable").drop(columns="_order")
+    path = _write_part(_rows_frame(merged.to_dict("records")), dataset_dir, "rows")
+    for old in old_parts:
+        os.remove(old)
+    return path
+
+
+def append_labels(df: pd.DataFrame, columns: List[str], dataset_dir: str = DATASET_DIR) -> Optional[str]:
+    """Record label values for the given rows (detail_relative plus the label columns)."""
+    labels = df.loc[:, [KEY] + columns].dropna(subset=[KEY])
+    if labels.empty:
+        return None
+    return _write_part(labels.astype({c: "string" for c in columns}), dataset_dir, "labels")
+
+
+def ensure_migrated(dataset_dir: str = DATASET_DIR, legacy_csv: Optional[str] = None) -> None:
+    """Import the legacy full CSV (rows and label columns) the first time the store is used."""
+    if legacy_csv is None:
+        # The legacy CSV belongs to the default store only, not to other consultations' stores
+        legacy_csv = LEGACY_CSV if dataset_dir == DATASET_DIR else ""
+    if _part_files(dataset_dir, "rows") or not legacy_csv or not os.path.exists(legacy_csv):
+        return
+    legacy = pd.read_csv(legacy_csv)
+    _write_part(_rows_frame(legacy.to_dict("records")), dataset_dir, "rows")
+    label_cols = [c for c in legacy.columns if c not in ROW_COLUMNS]
+    if label_cols:
+        append_labels(legacy, label_cols, dataset_dir)
+    print(f"Imported {len(legacy)} rows from {legacy_csv} into {dataset_dir}")
+
+
+def compact(dataset_dir: str = DATASET_DIR) -> int:
+    """Merge the part files of every daily partition into one file; returns the number of parts removed."""
+    removed = 0
+    for table in ("rows", "labels"):
+        for partition in sorted(glob.glob(os.path.join(dataset_dir, table, "dt=*"))):
+            parts = sorted(glob.glob(os.path.join(partition, "part-*.parquet")))
+            if len(parts) < 2:
+                continue
+            # The merged part is written first and sorts after the old ones, so a crash before
+            # the old parts are removed only leaves duplicates that readers already resolve
+            _write_part(_read_parts(parts), dataset_dir, table, dt=os.path.basename(partition)[3:])
+            for old in parts:
+                os.remove(old)
+            removed += len(parts) - 1
+    return removed
+
+
+# ------------------------------
+# Reading
+# ------------------------------
+def has_rows(dataset_dir: str = DATASET_DIR) -> bool:
+    return bool(_part_files(dataset_dir, "rows"))
+
+
+def read_rows(dataset_dir: str = DATASET_DIR) -> pd.DataFrame:
+    rows = _read_parts(_part_files(dataset_dir, "rows"))
+    if rows.empty:
+        return pd.DataFrame(columns=ROW_COLUMNS)
+    return rows.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+
+
+def read_labels(dataset_dir: str = DATASET_DIR) -> pd.DataFrame:
+    """Latest non-empty value of every label column per detail_relative."""
+    updates = _read_parts(_part_files(dataset_dir, "labels"))
+    if updates.empty:
+        return pd.DataFrame(columns=[KEY])
+    labels = pd.DataFrame({KEY: updates[KEY].drop_duplicates()})
+    for col in [c for c in updates.columns if c != KEY]:
+        latest = updates.loc[updates[col].notna(), [KEY, col]].drop_duplicates(KEY, keep="last")
+        labels = labels.merge(latest, on=KEY, how="left")
+        labels[col] = labels[col].mask(labels[col] == CLEARED)
+    return labels
+
+
+def read_dataset(dataset_dir: str = DATASET_DIR) -> pd.DataFrame:
+    """All scraped rows as one table, in ingestion order, with their current labels joined on."""
+    ensure_migrated(dataset_dir)
+    rows = read_rows(dataset_dir)
+    labels = read_labels(dataset_dir)
+    if len(labels.columns) == 1:
+        return rows
+    df = rows.merge(labels, on=KEY, how="left")
+    label_cols = [c for c in labels.columns if c != KEY]
+    # Plain object columns with None for missing values, like the scraped columns
+    df[label_cols] = df[label_cols].astype(object).where(df[label_cols].notna(), None)
+    return df
+
+
+def export_csv(path: str, dataset_dir: str = DATASET_DIR) -> pd.DataFrame:
+    df = read_dataset(dataset_dir)
+    df.to_csv(path, index=False)
+    return df
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "compact":
+        print(f"Removed {compact()} part files by compaction in {DATASET_DIR}")
+    elif command == "export" and len(sys.argv) == 3:
+        df = export_csv(sys.argv[2])
+        print(f"Exported {len(df)} rows to {sys.argv[2]}")
+    else:
+        print("usage: python dataset_store.py compact | export OUT.csv", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the Gemini API, for running analytics.py without spending quota.
+
+FakeClient has the part of genai.Client that analytics.py uses
+(client.aio.models.generate_content). It reads the fields and items from the
+labeling prompt and answers with a JSON array in the same format, with labels
+derived from a hash of each text, so a text always gets the same labels. Token
+usage is estimated like quota_limiter does and reported in usage_metadata.
+
+Failure modes (decided by a seeded random generator, so runs compare):
+    latency_ms / jitter_ms   base delay per call, uniform in latency +- jitter
+    ms_per_item              extra delay per item (answers take longer to generate)
+    error_rate               fraction of calls failing with 503 UNAVAILABLE
+    quota_rate               fraction of calls failing with 429 RESOURCE_EXHAUSTED
+    requests_per_minute      server-side quota: calls beyond it in a 60 s window get a 429
+    malformed_rate           fraction of answers cut off mid-array (partial JSON)
+    drop_rate                fraction of items left out of otherwise valid answers
+
+    analytics.set_client(FakeClient(latency_ms=800, quota_rate=0.02, malformed_rate=0.01))
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+from google.genai import errors
+
+from label_tasks import TASKS
+from quota_limiter import estimate_tokens
+
+_FIELD_RE = re.compile(r"^- (\w+): one of", re.M)
+ITEMS_MARKER = "Items to classify (JSON):\n"
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int, output_tokens: int):
+        self.text = text
+        self.parsed = None  # like a response whose structured parse failed: callers read .text
+        self.usage_metadata = type("UsageMetadata", (), {
+            "prompt_token_count": prompt_tokens,
+            "candidates_token_count": output_tokens,
+            "total_token_count": prompt_tokens + output_tokens,
+        })()
+
+
+def fake_label(field: str, text: str) -> str:
+    """The label the fake model gives `text` for `field`: fixed per text, spread over the field's values."""
+    values = TASKS[field].values
+    digest = hashlib.sha1(f"{field}\0{text}".encode("utf-8")).digest()
+    return values[digest[0] % len(values)]
+
+
+class FakeModels:
+    def __init__(self, latency_ms: float = 500.0, jitter_ms: float = 200.0, ms_per_item: float = 20.0,
+                 error_rate: float = 0.0, quota_rate: float = 0.0, requests_per_minute: int = 0,
+                 malformed_rate: float = 0.0, drop_rate: float = 0.0, seed: int = 0):
+        self.latency = (max(0.0, latency_ms - jitter_ms) / 1000, (latency_ms + jitter_ms) / 1000)
+        self.per_item = ms_per_item / 1000
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.requests_per_minute = requests_per_minute
+        self.malformed_rate = malformed_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.stats: Counter = Counter()
+        self._recent: Deque[float] = deque()
+
+    def _over_quota(self) -> bool:
+        if not self.requests_per_minute:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.requests_per_minute:
+            return True
+        self._recent.append(now)
+        return False
+
+    async def generate_content(self, model: str, contents: str, config: Optional[Dict] = None) -> FakeResponse:
+        self.stats["calls"] += 1
+        fields = _FIELD_RE.findall(contents)
+        items: List[Dict] = json.loads(contents.split(ITEMS_MARKER, 1)[1]) if ITEMS_MARKER in contents else []
+        await asyncio.sleep(self.random.uniform(*self.latency) + self.per_item * len(items))
+        if self._over_quota() or self.random.random() < self.quota_rate:
+            self.stats["quota_errors"] += 1
+            raise errors.ClientError(429, {"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded (fake)",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "2s"}],
+            }})
+        if self.random.random() < self.error_rate:
+            self.stats["server_errors"] += 1
+            raise errors.ServerError(503, {"error": {"code": 503, "status": "UNAVAILABLE",
+                                                     "message": "The model is overloaded (fake)"}})
+        answers = [
+            {"row_index": it["row_index"], **{f: fake_label(f, it["text"]) for f in fields if f in TASKS}}
+            for it in items if not (self.drop_rate and self.random.random() < self.drop_rate)
+        ]
+        text = json.dumps(answers, ensure_ascii=False)
+        if self.random.random() < self.malformed_rate:
+            self.stats["malformed"] += 1
+            text = text[:self.random.randint(0, len(text) - 1)] if text else text
+        prompt_tokens, output_tokens = estimate_tokens(contents), estimate_tokens(text)
+        self.stats["items"] += len(items)
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["output_tokens"] += output_tokens
+        return FakeResponse(text, prompt_tokens, output_tokens)
+
+
+class FakeClient:
+    """Drop-in for genai.Client in analytics.set_client(); keyword arguments go to FakeModels."""
+
+    def __init__(self, **options):
+        self.models = FakeModels(**options)
+        self.aio = type("AsyncClient", (), {"models": self.models})()
+
+    @property
+    def stats(self) -> Counter:
+        return self.models.stats
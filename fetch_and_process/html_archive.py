@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed archive of fetched listing and detail pages.
+
+Layout under ARCHIVE_DIR:
+    objects/ab/ab12...ef.html.gz   gzip-compressed page, named by the SHA-256 of its HTML
+    index.jsonl                    one line per fetch: {"url", "kind", "sha256", "fetched_at"}
+
+Identical pages are stored once, however often they are fetched. The index is
+append-only, so the latest snapshot of a URL is its last line. put() may be
+called from several threads (main_batched.py runs it off the event loop).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+ARCHIVE_DIR = "data/html_archive"
+
+
+def content_hash(html: str) -> str:
+    """SHA-256 of a page's HTML, the name it is archived under."""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+class HtmlArchive:
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.jsonl")
+        self._index_file = None
+        self._lock = threading.Lock()
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}.html.gz")
+
+    def put(self, url: str, html: str, kind: str, sha256: Optional[str] = None) -> str:
+        """
+        Store a fetched page (kind is "list" or "detail") and record it in the index; returns its hash.
+        Pass sha256 when the caller has already hashed the page.
+        """
+        raw = html.encode("utf-8")
+        sha256 = sha256 or hashlib.sha256(raw).hexdigest()
+        path = self.object_path(sha256)
+        # Compress outside the lock so threads only wait for each other's file writes
+        compressed = gzip.compress(raw, compresslevel=6) if not os.path.exists(path) else None
+        with self._lock:
+            if compressed is not None and not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, path)
+
+            if self._index_file is None:
+                os.makedirs(self.root, exist_ok=True)
+                self._index_file = open(self.index_path, "a", encoding="utf-8")
+            entry = {
+                "url": url,
+                "kind": kind,
+                "sha256": sha256,
+                "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            self._index_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index_file.flush()
+        return sha256
+
+    def get(self, sha256: str) -> str:
+        with gzip.open(self.object_path(sha256), "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def entries(self, kind: Optional[str] = None) -> Iterator[Dict]:
+        """Yield index entries in fetch order, optionally only one kind."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if kind is None or entry["kind"] == kind:
+                    yield entry
+
+    def latest(self, kind: Optional[str] = None) -> Dict[str, Dict]:
+        """Map each URL to its most recent index entry."""
+        return {entry["url"]: entry for entry in self.entries(kind)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML parser backends for internetconsultatie.nl listing and detail pages.
+
+LxmlParser builds the tree in C and is several times faster than BeautifulSoup's
+pure-Python html.parser; it is picked automatically when lxml is installed.
+The backends return the same values for well-formed pages and for common
+malformed markup (tests/test_html_parsers.py runs both over tests/fixtures/).
+They differ where markup relies on implied end tags: html.parser does not
+close an unclosed <td>, <li> or <p> at the next sibling, so a table row or
+list item swallows the ones after it. lxml closes them as browsers do.
+
+Check that the backends agree on stored pages (e.g. the test_response.html
+written by test_single.py):
+
+    python html_parsers.py page1.html some/dir/with/pages
+"""
+
+import gzip
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # optional: fall back to BeautifulSoup
+    lxml = None
+
+LAST_PAGE_RE = re.compile(r"/reacties/(?:datum|naam)/(\d+)")
+
+# BeautifulSoup's get_text() skips the contents of these tags
+_NON_TEXT_TAGS = {"script", "style", "template"}
+
+
+def empty_detail(html: str) -> Dict:
+    return {
+        "detail_naam": None,
+        "detail_plaats": None,
+        "detail_datum": None,
+        "qna": [],
+        "raw_html_length": len(html),
+    }
+
+
+class BeautifulSoupParser:
+    """Reference implementation using BeautifulSoup with html.parser."""
+
+    name = "bs4"
+
+    def detect_last_page(self, html: str) -> int:
+        soup = BeautifulSoup(html, "html.parser")
+        last_page = 1
+        nav = soup.select_one("div.pagination div.pagination__index ul")
+        if not nav:
+            return last_page
+        for a in nav.find_all("a"):
+            m = LAST_PAGE_RE.search(a.get("href", ""))
+            if m:
+                last_page = max(last_page, int(m.group(1)))
+        return last_page
+
+    def parse_list_items(self, html: str, base: str) -> List[Dict]:
+        soup = BeautifulSoup(html, "html.parser")
+        out = []
+        box = soup.select_one("div.result--list ul")
+        if not box:
+            return out
+        for li in box.find_all("li", recursive=False):
+            a = li.find("a")
+            p = li.find("p")
+            if not a:
+                continue
+            name = a.get_text(strip=True)
+            href = a.get("href", "").strip()
+            abs_link = urljoin(base, href)
+            place, date_time = None, None
+            if p:
+                txt = p.get_text(" ", strip=True)
+                if " | " in txt:
+                    place, date_time = txt.split(" | ", 1)
+                else:
+                    place = txt
+            out.append({
+                "list_name": name,
+                "list_place": place,
+                "list_date_time": date_time,
+                "detail_relative": href,
+                "detail_url": abs_link,
+            })
+        return out
+
+    def parse_detail_html(self, html: str) -> Dict:
+        soup = BeautifulSoup(html, "html.parser")
+        data = empty_detail(html)
+
+        table = soup.select_one("table.table__data-overview")
+        if table:
+            for tr in table.select("tr"):
+                th, td = tr.find("th"), tr.find("td")
+                if not th or not td:
+                    continue
+                key = th.get_text(" ", strip=True).lower()
+                val = td.get_text(" ", strip=True)
+                if key == "naam":
+                    data["detail_naam"] = val
+                elif key == "plaats":
+                    data["detail_plaats"] = val
+                elif key == "datum":
+                    data["detail_datum"] = val
+
+        content_root = soup.select_one('div.container[role="main"]#content')
+        if content_root:
+            for h3 in content_root.find_all("h3"):
+                vraag = h3.get_text(" ", strip=True)
+                blockquote = h3.find_next("blockquote")
+                if blockquote:
+                    antwoord = blockquote.get_text("\n", strip=True)
+                    data["qna"].append({"vraag": vraag, "antwoord": antwoord})
+
+        return data
+
+
+def _has_class(cls: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+
+class LxmlParser:
+    """lxml implementation mirroring BeautifulSoupParser's selectors and get_text() semantics."""
+
+    name = "lxml"
+
+    _pagination = f"//div[{_has_class('pagination')}]//div[{_has_class('pagination__index')}]//ul"
+    _list_box = f"//div[{_has_class('result--list')}]//ul"
+    _data_table = f"//table[{_has_class('table__data-overview')}]"
+    _content_root = f"//div[{_has_class('container')}][@role='main'][@id='content']"
+    # find_next() searches everything after the tag in document order, its own descendants included
+    _next_blockquote = "(descendant::blockquote | following::blockquote)[1]"
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("lxml is not installed; use the 'bs4' parser backend or pip install lxml")
+        self._html_parser = lxml.html.HTMLParser(encoding="utf-8")
+
+    def _document(self, html: str):
+        # Parse bytes so pages with an XML encoding declaration are accepted
+        try:
+            return lxml.html.fromstring(html.encode("utf-8"), parser=self._html_parser)
+        except (etree.ParserError, ValueError):
+            return None
+
+    @staticmethod
+    def _first(node, xpath: str):
+        found = node.xpath(xpath)
+        return found[0] if found else None
+
+    @classmethod
+    def _strings(cls, el) -> Iterator[str]:
+        if el.text:
+            yield el.text
+        for child in el:
+            # Comments and processing instructions have a non-string tag: skip their content, keep their tail
+            if isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+                yield from cls._strings(child)
+            if child.tail:
+                yield child.tail
+
+    @classmethod
+    def _text(cls, el, sep: str = "") -> str:
+        """Equivalent of BeautifulSoup's el.get_text(sep, strip=True)."""
+        return sep.join(s for s in (t.strip() for t in cls._strings(el)) if s)
+
+    def detect_last_page(self, html: str) -> int:
+        last_page = 1
+        doc = self._document(html)
+        nav = self._first(doc, self._pagination) if doc is not None else None
+        if nav is None:
+            return last_page
+        for a in nav.iter("a"):
+            m = LAST_PAGE_RE.search(a.get("href", ""))
+            if m:
+                last_page = max(last_page, int(m.group(1)))
+        return last_page
+
+    def parse_list_items(self, html: str, base: str) -> List[Dict]:
+        out = []
+        doc = self._document(html)
+        box = self._first(doc, self._list_box) if doc is not None else None
+        if box is None:
+            return out
+        for li in box.iterchildren("li"):
+            a = next(li.iter("a"), None)
+            p = next(li.iter("p"), None)
+            if a is None:
+                continue
+            href = a.get("href", "").strip()
+            place, date_time = None, None
+            if p is not None:
+                txt = self._text(p, " ")
+                if " | " in txt:
+                    place, date_time = txt.split(" | ", 1)
+                else:
+                    place = txt
+            out.append({
+                "list_name": self._text(a),
+                "list_place": place,
+                "list_date_time": date_time,
+                "detail_relative": href,
+                "detail_url": urljoin(base, href),
+            })
+        return out
+
+    def parse_detail_html(self, html: str) -> Dict:
+        data = empty_detail(html)
+        doc = self._document(html)
+        if doc is None:
+            return data
+
+        table = self._first(doc, self._data_table)
+        if table is not None:
+            for tr in table.iter("tr"):
+                th, td = next(tr.iter("th"), None), next(tr.iter("td"), None)
+                if th is None or td is None:
+                    continue
+                key = self._text(th, " ").lower()
+                val = self._text(td, " ")
+                if key == "naam":
+                    data["detail_naam"] = val
+                elif key == "plaats":
+                    data["detail_plaats"] = val
+                elif key == "datum":
+                    data["detail_datum"] = val
+
+        content_root = self._first(doc, self._content_root)
+        if content_root is not None:
+            for h3 in content_root.iter("h3"):
+                blockquote = self._first(h3, self._next_blockquote)
+                if blockquote is not None:
+                    data["qna"].append({"vraag": self._text(h3, " "), "antwoord": self._text(blockquote, "\n")})
+
+        return data
+
+
+PARSERS = {"bs4": BeautifulSoupParser, "lxml": LxmlParser}
+
+
+def get_parser(backend: str = "auto"):
+    """Return a parser instance: 'lxml', 'bs4', or 'auto' (lxml when installed)."""
+    if backend == "auto":
+        backend = "lxml" if lxml is not None else "bs4"
+    if backend not in PARSERS:
+        raise ValueError(f"Unknown parser backend {backend!r}; expected one of {sorted(PARSERS)} or 'auto'")
+    return PARSERS[backend]()
+
+
+_parsers: Dict[str, object] = {}
+
+
+def cached_parser(backend: str):
+    """One parser per backend per process (used by worker processes)."""
+    if backend not in _parsers:
+        _parsers[backend] = get_parser(backend)
+    return _parsers[backend]
+
+
+def parse_detail_html(html: str, backend: str = "auto") -> Dict:
+    """Module-level entry point so detail parsing can be shipped to a process pool."""
+    return cached_parser(backend).parse_detail_html(html)
+
+
+def parse_list_items(html: str, base: str, backend: str = "auto") -> List[Dict]:
+    return cached_parser(backend).parse_list_items(html, base)
+
+
+# ------------------------------
+# Parity check
+# ------------------------------
+def read_page(path: str) -> str:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def iter_page_paths(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith((".html", ".html.gz")):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def compare_backends(html: str, base: str = "https://internetconsultatie.nl") -> Optional[str]:
+    """Run every parse function through both backends; return a description of the first difference."""
+    reference, fast = BeautifulSoupParser(), LxmlParser()
+    checks = [
+        ("detect_last_page", lambda p: p.detect_last_page(html)),
+        ("parse_list_items", lambda p: p.parse_list_items(html, base)),
+        ("parse_detail_html", lambda p: p.parse_detail_html(html)),
+    ]
+    for name, run in checks:
+        expected, actual = run(reference), run(fast)
+        if expected != actual:
+            return f"{name}: bs4={expected!r} lxml={actual!r}"
+    return None
+
+
+def main(paths: List[str]) -> int:
+    checked, mismatches = 0, 0
+    for path in iter_page_paths(paths):
+        checked += 1
+        diff = compare_backends(read_page(path))
+        if diff:
+            mismatches += 1
+            print(f"✗ {path}\n    {diff[:500]}")
+    print(f"Checked {checked} pages: {checked - mismatches} identical, {mismatches} mismatched")
+    return 1 if mismatches or not checked else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python html_parsers.py PAGE_OR_DIR [PAGE_OR_DIR ...]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compaction and a byte-offset index for the append-only JSONL backup.
+
+The scraper only ever appends to JSONL_PATH, so re-scrapes leave several records
+for the same detail_relative. compact() rewrites the file with only the latest
+record per ID and writes a sidecar index (JSONL_PATH + ".idx") that maps each ID
+to the byte offset and length of its line:
+
+    # jsonl-index v1 size=<bytes of the JSONL file covered by the index>
+    <offset>\t<length>\t<detail_relative>
+
+JsonlReader uses the index to fetch single records or ranges by seeking into an
+mmap of the file. Lines appended after the index was written are picked up by
+scanning only the unindexed tail.
+
+    python jsonl_store.py compact [PATH]   # dedupe in place and write the index
+    python jsonl_store.py index [PATH]     # (re)build the index without rewriting
+    python jsonl_store.py get ID [PATH]    # print one record
+"""
+
+import json
+import mmap
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+JSONL_PATH = "data/natur_reacties_full.jsonl"
+KEY = "detail_relative"
+INDEX_HEADER = "# jsonl-index v1 size="
+
+
+def index_path(path: str) -> str:
+    return f"{path}.idx"
+
+
+def _scan(f, start: int = 0) -> Iterator[Tuple[int, int, Optional[str]]]:
+    """Yield (offset, length, id) for every complete line from byte offset start on."""
+    f.seek(start)
+    offset = start
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # a line still being written
+        if line.strip():
+            yield offset, len(line), json.loads(line).get(KEY)
+        offset += len(line)
+
+
+def _latest_offsets(path: str, start: int = 0) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    """Return ({id: (offset, length) of its last line}, number of lines scanned)."""
+    latest: Dict[str, Tuple[int, int]] = {}
+    lines = 0
+    with open(path, "rb") as f:
+        for offset, length, key in _scan(f, start):
+            # Records without an ID cannot be deduplicated; keep each under its own offset
+            latest[key if key is not None else f"@{offset}"] = (offset, length)
+            lines += 1
+    return latest, lines
+
+
+def write_index(path: str, entries: Dict[str, Tuple[int, int]], size: int) -> None:
+    tmp = f"{index_path(path)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(f"{INDEX_HEADER}{size}\n")
+        for key, (offset, length) in sorted(entries.items(), key=lambda e: e[1][0]):
+            f.write(f"{offset}\t{length}\t{key}\n")
+    os.replace(tmp, index_path(path))
+
+
+def read_index(path: str) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    """Return ({id: (offset, length)}, covered size); an empty index if it is missing or stale."""
+    idx = index_path(path)
+    if not os.path.exists(idx) or not os.path.exists(path):
+        return {}, 0
+    entries: Dict[str, Tuple[int, int]] = {}
+    with open(idx, "r", encoding="utf-8") as f:
+        header = f.readline()
+        if not header.startswith(INDEX_HEADER):
+            return {}, 0
+        size = int(header[len(INDEX_HEADER):])
+        for line in f:
+            offset, length, key = line.rstrip("\n").split("\t", 2)
+            entries[key] = (int(offset), int(length))
+    # A file that shrank was rewritten behind the index's back
+    if size > os.path.getsize(path):
+        return {}, 0
+    return entries, size
+
+
+def build_index(path: str = JSONL_PATH) -> int:
+    """Index the file as it is (latest line per ID wins); returns the number of IDs."""
+    entries, _ = _latest_offsets(path)
+    size = max((o + n for o, n in entries.values()), default=0)
+    write_index(path, entries, size)
+    return len(entries)
+
+
+def compact(path: str = JSONL_PATH) -> Tuple[int, int]:
+    """
+    Rewrite the file keeping only the latest record per detail_relative, in the order those
+    records were appended, and write a fresh index. Run it while the scraper is not writing.
+    Returns (records kept, records dropped).
+    """
+    latest, total = _latest_offsets(path)
+    tmp = f"{path}.compact.tmp"
+    entries: Dict[str, Tuple[int, int]] = {}
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        for key, (offset, length) in sorted(latest.items(), key=lambda e: e[1][0]):
+            src.seek(offset)
+            line = src.read(length)
+            entries[key] = (dst.tell(), length)
+            dst.write(line)
+        dst.flush()
+        os.fsync(dst.fileno())
+        size = dst.tell()
+    # Drop the old index first: a crash between the two replaces leaves no index, never a wrong one
+    if os.path.exists(index_path(path)):
+        os.remove(index_path(path))
+    os.replace(tmp, path)
+    write_index(path, entries, size)
+    return len(entries), total - len(entries)
+
+
+class JsonlReader:
+    """Random access to the latest record per ID through the offset index and an mmap of the file."""
+
+    def __init__(self, path: str = JSONL_PATH):
+        self.path = path
+        self.entries, indexed_size = read_index(path)
+        # Appends since the index was written override the indexed records
+        self.entries.update(_latest_offsets(path, indexed_size)[0])
+        self.order: List[str] = sorted(self.entries, key=lambda k: self.entries[k][0])
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def keys(self) -> List[str]:
+        return list(self.order)
+
+    def _load(self, key: str) -> Dict:
+        offset, length = self.entries[key]
+        record = json.loads(self._mm[offset:offset + length])
+        if record.get(KEY) not in (None, key):
+            raise ValueError(f"{index_path(self.path)} is stale; rebuild it with: python jsonl_store.py index")
+        return record
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._load(key) if key in self.entries else None
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        """Records in file order, optionally a slice [start:stop] of them."""
+        for key in self.order[start:stop]:
+            yield self._load(key)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["compact"] and len(args) <= 2:
+        target = args[1] if len(args) == 2 else JSONL_PATH
+        kept, dropped = compact(target)
+        print(f"Compacted {target}: kept {kept} records, dropped {dropped} superseded ones")
+    elif args[:1] == ["index"] and len(args) <= 2:
+        target = args[1] if len(args) == 2 else JSONL_PATH
+        print(f"Indexed {build_index(target)} IDs in {index_path(target)}")
+    elif args[:1] == ["get"] and len(args) in (2, 3):
+        with JsonlReader(args[2] if len(args) == 3 else JSONL_PATH) as reader:
+            record = reader.get(args[1])
+        if record is None:
+            print(f"{args[1]} not found", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+    else:
+        print("usage: python jsonl_store.py compact [PATH] | index [PATH] | get ID [PATH]", file=sys.stderr)
+        sys.exit(2)
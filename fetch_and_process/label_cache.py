@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of LLM classification results, kept in SQLite.
+
+A result is stored under the SHA-256 of (task, model, prompt version,
+normalized input text). Re-running a labeling script, or labeling a duplicate
+submission, then reads the stored label instead of calling the API. The prompt
+version is a fingerprint of the prompt template and response schema (see
+prompt_version()), so editing either one misses the cache instead of
+returning labels produced by the old prompt.
+
+When the stored values exceed max_bytes, the least recently used entries are
+evicted.
+
+    python label_cache.py stats     # entries, size and hits per task/model/prompt version
+    python label_cache.py clear [TASK]
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import unicodedata
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CACHE_DB = "data/label_cache.sqlite"
+MAX_BYTES = 256 * 1024 * 1024  # Stored keys plus values; least recently used entries are evicted beyond this
+EVICT_TO = 0.9  # Evict down to this share of MAX_BYTES, so eviction does not run on every write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    key            TEXT PRIMARY KEY,
+    task           TEXT NOT NULL,
+    model          TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    value          TEXT NOT NULL,
+    size           INTEGER NOT NULL,
+    created_at     TEXT NOT NULL,
+    last_used_at   TEXT NOT NULL,
+    hits           INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS labels_last_used ON labels (last_used_at);
+"""
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with runs of whitespace collapsed, so re-scraped or re-pasted text still matches."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def prompt_version(template: str, schema: Dict, label: str = "v1") -> str:
+    """A version string that changes whenever the prompt template or the response schema changes."""
+    digest = hashlib.sha256((template + json.dumps(schema, sort_keys=True)).encode("utf-8")).hexdigest()
+    return f"{label}-{digest[:12]}"
+
+
+class LabelCache:
+    def __init__(self, path: str = CACHE_DB, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        # Counters for this session
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    @staticmethod
+    def make_key(task: str, model: str, version: str, text: str) -> str:
+        return hashlib.sha256("\0".join((task, model, version, normalize_text(text))).encode("utf-8")).hexdigest()
+
+    def get_many(self, task: str, model: str, version: str, texts: Iterable[str]) -> Dict[str, Dict]:
+        """Return {text: stored value} for the texts that are cached; hits are marked as recently used."""
+        # Texts that differ only in whitespace share a key
+        keys: Dict[str, List[str]] = {}
+        for text in texts:
+            keys.setdefault(self.make_key(task, model, version, text), []).append(text)
+        found: Dict[str, Dict] = {}
+        rows: List[Tuple[str, str]] = []
+        # Stay well below SQLite's bound-parameter limit
+        key_list = list(keys)
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            rows += self.conn.execute(
+                f"SELECT key, value FROM labels WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+        for key, value in rows:
+            for text in keys[key]:
+                found[text] = json.loads(value)
+        if rows:
+            now = utc_now()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE labels SET last_used_at = ?, hits = hits + 1 WHERE key = ?", ((now, k) for k, _ in rows)
+                )
+        self.hits += len(rows)
+        self.misses += len(keys) - len(rows)
+        return found
+
+    def put_many(self, task: str, model: str, version: str, values: Dict[str, Dict]) -> None:
+        """Store {text: value} in one transaction, then evict if the cache grew past max_bytes."""
+        if not values:
+            return
+        now = utc_now()
+        rows = []
+        for text, value in values.items():
+            key = self.make_key(task, model, version, text)
+            encoded = json.dumps(value, ensure_ascii=False, sort_keys=True)
+            rows.append((key, task, model, version, encoded, len(key) + len(encoded.encode("utf-8")), now, now))
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO labels (key, task, model, prompt_version, value, size, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+        self.stored += len(rows)
+        self.evict()
+
+    def total_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM labels").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache is within max_bytes; returns the number dropped."""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        target = self.max_bytes * EVICT_TO
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM labels ORDER BY last_used_at"):
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        with self.conn:
+            self.conn.executemany("DELETE FROM labels WHERE key = ?", victims)
+        self.evicted += len(victims)
+        return len(victims)
+
+    def clear(self, task: Optional[str] = None) -> int:
+        with self.conn:
+            if task is None:
+                cursor = self.conn.execute("DELETE FROM labels")
+            else:
+                cursor = self.conn.execute("DELETE FROM labels WHERE task = ?", (task,))
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        groups = [
+            {"task": task, "model": model, "prompt_version": version, "entries": n, "bytes": size, "hits": hits,
+             "last_used_at": last_used}
+            for task, model, version, n, size, hits, last_used in self.conn.execute(
+                """
+                SELECT task, model, prompt_version, COUNT(*), SUM(size), SUM(hits), MAX(last_used_at)
+                FROM labels GROUP BY task, model, prompt_version ORDER BY task, model, MAX(last_used_at) DESC
+                """
+            )
+        ]
+        return {
+            "path": self.path,
+            "entries": sum(g["entries"] for g in groups),
+            "bytes": sum(g["bytes"] for g in groups),
+            "max_bytes": self.max_bytes,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "groups": groups,
+            "session": {"hits": self.hits, "misses": self.misses, "stored": self.stored, "evicted": self.evicted},
+        }
+
+    def describe(self) -> str:
+        looked_up = self.hits + self.misses
+        rate = f" ({self.hits / looked_up:.0%} hit rate)" if looked_up else ""
+        return f"{self.hits} hits, {self.misses} misses{rate}, {self.stored} stored, {self.evicted} evicted"
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def print_stats(stats: Dict) -> None:
+    print(f"{stats['path']}: {stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MiB of "
+          f"{stats['max_bytes'] / 2**20:.0f} MiB (file {stats['file_bytes'] / 2**20:.1f} MiB)")
+    for g in stats["groups"]:
+        print(f"  {g['task']:<10} {g['model']:<20} {g['prompt_version']:<16} {g['entries']:>8} entries "
+              f"{g['bytes'] / 1e3:>10.1f} kB {g['hits']:>8} hits  last used {g['last_used_at'][:19]}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args == ["stats"]:
+        with LabelCache() as cache:
+            print_stats(cache.stats())
+    elif args[:1] == ["clear"] and len(args) <= 2:
+        with LabelCache() as cache:
+            print(f"Removed {cache.clear(args[1] if len(args) == 2 else None)} entries from {cache.path}")
+    else:
+        print("usage: python label_cache.py stats | clear [TASK]", file=sys.stderr)
+        sys.exit(2)
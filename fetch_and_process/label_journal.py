@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only journal of label values, written after every labeled batch.
+
+Each line is one JSON record {"id", "field", "value", "model", "ts"}: the row's
+detail_relative, the label column, its new value, the model (or local source)
+that produced it and a UTC timestamp. Appending a batch costs as much as the
+batch, and every append is flushed to disk, so a crash loses at most the batch
+being labeled; a line cut off by the crash is ignored when reading.
+
+merge() folds the journal into the dataset store as one label part (the latest
+value per row and field wins) and empties it. analytics.py merges at the start
+of a run (picking up what a crashed run left) and at the end.
+
+    python label_journal.py status   # entries waiting to be merged
+    python label_journal.py merge    # merge the journal into the dataset store now
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from dataset_store import DATASET_DIR, KEY, append_labels
+
+JOURNAL_PATH = "data/label_journal.jsonl"
+
+
+def record(df: pd.DataFrame, columns: List[str], model: Union[str, pd.Series], path: str = JOURNAL_PATH) -> int:
+    """
+    Append the non-empty values of `columns` for the rows of df; `model` is one name for all rows
+    or a Series aligned with df. Returns the number of entries written.
+    """
+    ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    models = model if isinstance(model, pd.Series) else pd.Series(model, index=df.index)
+    lines = []
+    for row, key in df[KEY].items():
+        if pd.isna(key):
+            continue
+        for col in columns:
+            value = df.at[row, col]
+            if value is None or pd.isna(value):
+                continue
+            lines.append(json.dumps({"id": key, "field": col, "value": str(value), "model": models.at[row],
+                                     "ts": ts}, ensure_ascii=False))
+    if not lines:
+        return 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return len(lines)
+
+
+def read_entries(path: str = JOURNAL_PATH) -> List[Dict]:
+    """All complete journal entries, oldest first."""
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:  # a line cut off by a crash
+                continue
+    return entries
+
+
+def latest_values(path: str = JOURNAL_PATH) -> pd.DataFrame:
+    """One row per journaled detail_relative with the latest value of every journaled field."""
+    entries = pd.DataFrame(read_entries(path), columns=["id", "field", "value", "model", "ts"])
+    if entries.empty:
+        return pd.DataFrame(columns=[KEY])
+    latest = entries.drop_duplicates(["id", "field"], keep="last")
+    wide = latest.pivot(index="id", columns="field", values="value")
+    wide.columns.name = None
+    return wide.rename_axis(KEY).reset_index()
+
+
+def merge(path: str = JOURNAL_PATH, dataset_dir: str = DATASET_DIR) -> int:
+    """Write the journal into the dataset store as one label part and empty it; returns the rows merged."""
+    merging = f"{path}.merging"
+    if os.path.exists(path):
+        if os.path.exists(merging):
+            # A merge was interrupted; finish that one first so the newer entries stay the latest
+            merge_file(merging, dataset_dir)
+        os.replace(path, merging)
+    return merge_file(merging, dataset_dir) if os.path.exists(merging) else 0
+
+
+def merge_file(path: str, dataset_dir: str = DATASET_DIR) -> int:
+    values = latest_values(path)
+    if len(values):
+        append_labels(values, [c for c in values.columns if c != KEY], dataset_dir)
+    # Removed only once the part is written; a crash in between merges the same values again
+    os.remove(path)
+    return len(values)
+
+
+def pending(path: str = JOURNAL_PATH) -> int:
+    return sum(len(read_entries(p)) for p in (path, f"{path}.merging"))
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) == 2 else ""
+    if command == "status":
+        print(f"{pending()} journal entries waiting to be merged into {DATASET_DIR}")
+    elif command == "merge":
+        print(f"Merged labels of {merge()} rows from {JOURNAL_PATH} into {DATASET_DIR}")
+    else:
+        print("usage: python label_journal.py status | merge", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Plan which rows still need labels.
+
+plan_labeling() selects the rows that are missing any of the requested label
+fields. Rows are identified by detail_relative, not by their position in the
+table, so gaps left by failed batches, merged stores or newly scraped
+reactions are found wherever they are. Only those rows are batched, and a
+daily run costs as much as the number of new or unlabeled reactions.
+
+Each planned row carries the fields it should be asked for: the requested
+fields it is missing, or all of them when relabeling. Rows can be narrowed to a
+label_tasks.select_rows() filter first.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from dataset_store import KEY
+
+
+@dataclass
+class LabelPlan:
+    keys: List[str]  # detail_relative of the rows to label, in dataset order
+    total: int  # rows in the dataset
+    missing: Dict[str, int] = field(default_factory=dict)  # rows missing each requested field
+    unkeyed: int = 0  # rows without detail_relative; their labels could not be saved, so they are skipped
+    asks: List[Tuple[str, ...]] = field(default_factory=list)  # fields to ask for, per key
+
+    def groups(self) -> Dict[Tuple[str, ...], List[str]]:
+        """Keys by the fields they need, so rows needing the same fields share prompts."""
+        groups: Dict[Tuple[str, ...], List[str]] = {}
+        for key, fields in zip(self.keys, self.asks):
+            groups.setdefault(fields, []).append(key)
+        return groups
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def describe(self) -> str:
+        missing = ", ".join(f"{col} {n}" for col, n in self.missing.items())
+        text = f"{len(self.keys)} of {self.total} rows need labels (missing: {missing})"
+        if self.unkeyed:
+            text += f"; {self.unkeyed} rows without {KEY} skipped"
+        return text
+
+
+def plan_labeling(df: pd.DataFrame, fields: List[str], selected: Optional[pd.Series] = None,
+                  relabel: bool = False) -> LabelPlan:
+    """
+    The rows of df (one per detail_relative) missing any of `fields`; absent columns count as missing.
+    `selected` limits the plan to a boolean mask of rows; with relabel, every selected row is asked
+    for all of `fields`.
+    """
+    missing = pd.DataFrame(
+        {col: df[col].isna() if col in df.columns else pd.Series(True, index=df.index) for col in fields},
+        index=df.index,
+    )
+    if selected is None:
+        selected = pd.Series(True, index=df.index)
+    needed = selected if relabel else selected & missing.any(axis=1)
+    keyed = df[KEY].notna()
+    # A key appearing twice would be labeled twice; keep its last row, like read_rows()
+    todo = needed & keyed & ~df[KEY].duplicated(keep="last")
+    asked = missing[todo] if not relabel else pd.DataFrame(True, index=df.index[todo], columns=fields)
+    return LabelPlan(
+        keys=df.loc[todo, KEY].tolist(),
+        total=len(df),
+        missing={col: int((missing[col] & selected).sum()) for col in fields},
+        unkeyed=int((needed & ~keyed).sum()),
+        asks=[tuple(col for col, ask in zip(fields, row) if ask) for row in asked.itertuples(index=False)],
+    )
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registry of the label fields the LLM can be asked for, and row filters.
+
+Each LabelTask describes one dataset column: its allowed values, the line that
+asks for it in the prompt and its decision rules. build_prompt() and
+response_model() combine any subset of the registered tasks, so one call asks
+for exactly the fields its rows are missing. A new field is one more entry in
+TASKS.
+
+select_rows() evaluates a row filter over the dataset: comparisons of columns
+with values, `is null` / `is not null`, `in (...)`, combined with and/or/not.
+
+    python label_tasks.py                  # list the registered tasks
+    python label_tasks.py prompt FIELD...  # show the prompt for these fields
+"""
+
+import enum
+import json
+import re
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import pandas as pd
+from pydantic import BaseModel, create_model
+
+# Define what “For/Against” means for your task.
+POLICY_STATEMENT = (
+    "the proposal to extend the Dutch naturalization waiting period from 5 years to 10 years"
+)
+
+
+@dataclass(frozen=True)
+class LabelTask:
+    field: str  # dataset column, also the key in the LLM's answer
+    values: Tuple[str, ...]
+    question: str  # what to decide, shown next to the allowed values
+    rules: Tuple[str, ...]  # decision rules, one prompt line each
+
+    @property
+    def enum(self) -> Type[enum.Enum]:
+        return _enum(self.field, self.values)
+
+
+@lru_cache(maxsize=None)
+def _enum(field: str, values: Tuple[str, ...]) -> Type[enum.Enum]:
+    name = "".join(part.title() for part in field.split("_"))
+    return enum.Enum(name, {v.upper(): v for v in values})
+
+
+TASKS: Dict[str, LabelTask] = {t.field: t for t in (
+    LabelTask(
+        field="stance",
+        values=("For", "Against"),
+        question=f"the author's stance toward {POLICY_STATEMENT}",
+        rules=(
+            "\"For\" = the author supports the proposal.",
+            "\"Against\" = the author opposes the proposal.",
+            "If the stance is mixed or ambiguous, pick the more likely one—do not return any other labels.",
+        ),
+    ),
+    LabelTask(
+        field="language",
+        values=("Dutch", "English", "Both", "Other"),
+        question="the language of the text",
+        rules=(
+            "\"Dutch\" = text is primarily in Dutch",
+            "\"English\" = text is primarily in English",
+            "\"Other\" = text is in another language or mixed",
+        ),
+    ),
+    LabelTask(
+        field="identifies_as_immigrant",
+        values=("Yes", "No", "Unclear"),
+        question="does the author identify themselves as an immigrant/migrant?",
+        rules=(
+            "\"Yes\" = the author explicitly identifies as an immigrant/migrant or strongly implies they are",
+            "\"No\" = the author clearly indicates they are not an immigrant/migrant",
+            "\"Unclear\" = there is no clear indication either way",
+        ),
+    ),
+)}
+
+
+def check_fields(fields: Sequence[str]) -> Tuple[str, ...]:
+    """The fields in registry order; raises ValueError for unknown ones."""
+    unknown = [f for f in fields if f not in TASKS]
+    if unknown:
+        raise ValueError(f"unknown label field(s) {', '.join(unknown)}; registered: {', '.join(TASKS)}")
+    return tuple(f for f in TASKS if f in fields)
+
+
+def _one_of(values: Sequence[str]) -> str:
+    quoted = [f"\"{v}\"" for v in values]
+    return quoted[0] if len(quoted) == 1 else f"{', '.join(quoted[:-1])}{',' if len(quoted) > 2 else ''} or {quoted[-1]}"
+
+
+def build_prompt(fields: Sequence[str], items: List[Dict]) -> str:
+    """
+    The prompt asking for `fields` of every item.
+    items: list of {row_index: int, text: str}
+    """
+    tasks = [TASKS[f] for f in check_fields(fields)]
+    return (
+        "You are a careful annotator.\n"
+        "Task: For each item, read the 'text' and label it with the fields below.\n"
+        "Return a JSON array of objects with fields:\n"
+        "- row_index: the same integer we provide\n"
+        + "".join(f"- {t.field}: one of {_one_of(t.values)} ({t.question})\n" for t in tasks)
+        + "\nDecision rules:\n"
+        + "\n".join("".join(f"- {rule}\n" for rule in t.rules) for t in tasks)
+        + "\nItems to classify (JSON):\n"
+        f"{json.dumps(items, ensure_ascii=False)}"
+    )
+
+
+@lru_cache(maxsize=None)
+def response_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Pydantic model of one answer object: row_index plus an enum per field."""
+    fields = check_fields(fields)
+    name = "Labels" + "".join(TASKS[f].enum.__name__ for f in fields)
+    return create_model(name, row_index=(int, ...), **{f: (TASKS[f].enum, ...) for f in fields})
+
+
+_NULL_RE = re.compile(r"\b([A-Za-z_]\w*)\s+is\s+(not\s+)?null\b")
+
+
+def select_rows(df: pd.DataFrame, where: Optional[str]) -> pd.Series:
+    """
+    Boolean mask of the rows matching the filter expression (all rows for an empty one), e.g.
+        language == "Other"
+        stance is null and language != "English"
+        identifies_as_immigrant in ("Yes", "Unclear")
+    """
+    if not where or not where.strip():
+        return pd.Series(True, index=df.index)
+    expr = _NULL_RE.sub(lambda m: f"{m.group(1)}.{'notna' if m.group(2) else 'isna'}()", where)
+    try:
+        mask = df.eval(expr, engine="python")
+    except Exception as e:
+        raise ValueError(f"cannot evaluate row filter {where!r}: {e}") from e
+    if not isinstance(mask, pd.Series) or not mask.index.equals(df.index):
+        raise ValueError(f"row filter {where!r} does not give a true/false value per row")
+    return mask.fillna(False).astype(bool)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        for t in TASKS.values():
+            print(f"{t.field:<26} {' | '.join(t.values):<30} {t.question}")
+    elif args[0] == "prompt" and len(args) > 1:
+        try:
+            print(build_prompt(args[1:], []))
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        print("usage: python label_tasks.py [prompt FIELD...]", file=sys.stderr)
+        sys.exit(2)
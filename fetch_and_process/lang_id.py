@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline Dutch/English language identification with character trigrams.
+
+Every text is lowercased and mapped onto a small alphabet (a-z, one symbol for
+accented Latin letters, one for non-Latin letters, and a space for everything
+else). Its trigrams are scored naive-Bayes style against the profiles shipped in
+lang_profiles.json: Dutch, English, and profiles of other European languages
+(German, French, Spanish, ...) that all count as "Other", so those are not
+forced into Dutch or English. All texts of a column are encoded into one array and scored at once
+with numpy, so 10k+ reactions take a fraction of a second.
+
+detect() returns a label ("Dutch", "English" or "Other") and a confidence in
+0..1 per text. The confidence grows with the score margin and the length of the
+text, and drops when parts of the text (windows of CHUNK_SYMBOLS characters)
+disagree about the language, as in mixed Dutch/English reactions. Texts mostly
+in a non-Latin script are "Other". Callers send rows below MIN_CONFIDENCE to the
+LLM.
+
+The profiles are built from the training texts in lang_corpus/ (one CODE.txt
+per language in LANGUAGES); tests/test_lang_id.py checks the result on
+held-out sentences.
+
+    python lang_id.py "Ik ben het niet eens met dit voorstel."
+    python lang_id.py build                  # rebuild lang_profiles.json from lang_corpus/
+    python lang_id.py build nl=nl.txt ...    # or from other training texts
+"""
+
+import json
+import os
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROFILES_PATH = os.path.join(HERE, "lang_profiles.json")
+CORPUS_DIR = os.path.join(HERE, "lang_corpus")
+OTHER = "Other"
+LANGUAGES = {  # Profile code -> label
+    "nl": "Dutch", "en": "English",
+    "de": OTHER, "fr": OTHER, "es": OTHER, "it": OTHER, "pt": OTHER, "pl": OTHER, "tr": OTHER, "ro": OTHER,
+}
+MIN_CONFIDENCE = 0.9  # Below this, callers should ask the LLM
+SMOOTHING = 0.5  # Add-k smoothing for trigrams missing from a profile
+EVIDENCE_CAP = 200  # Trigrams counted towards the confidence; more text beyond this adds no certainty
+CONFIDENCE_SCALE = 0.015  # Converts (score margin per trigram x trigrams) into a confidence
+CHUNK_SYMBOLS = 60  # Window size for spotting mixed-language texts
+FOREIGN_SHARE = 0.3  # Texts with more non-Latin letters than this are "Other"
+
+# Alphabet: 0 = space/boundary, 1..26 = a..z, 27 = accented Latin letter, 28 = non-Latin letter
+SYMBOLS = " abcdefghijklmnopqrstuvwxyz*#"
+ACCENTED, FOREIGN = 27, 28
+SIZE = len(SYMBOLS)
+LUT_SIZE = 0x3000  # Code points above this (CJK, emoji, ...) are handled without the table
+
+
+def _lookup_table() -> np.ndarray:
+    table = np.zeros(LUT_SIZE, dtype=np.uint8)
+    for cp in range(LUT_SIZE):
+        ch = chr(cp)
+        if "a" <= ch <= "z":
+            table[cp] = ord(ch) - ord("a") + 1
+        elif ch.isalpha():
+            # Latin-1 supplement and Latin Extended letters; everything else alphabetic is another script
+            table[cp] = ACCENTED if 0xC0 <= cp < 0x250 else FOREIGN
+    return table
+
+
+_LUT = _lookup_table()
+
+
+def encode(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode texts into one symbol array; returns (symbols, starts) where text i occupies
+    symbols[starts[i]:starts[i + 1]] including two leading boundary symbols.
+    """
+    padded = ["  " + (t if isinstance(t, str) else "") for t in texts]
+    lengths = np.fromiter((len(p) for p in padded), dtype=np.int64, count=len(padded))
+    starts = np.concatenate(([0], np.cumsum(lengths)))
+    code_points = np.frombuffer(("".join(padded) + "  ").lower().encode("utf-32-le"), dtype=np.uint32)
+    symbols = _LUT.take(np.minimum(code_points, LUT_SIZE - 1))
+    high = code_points >= LUT_SIZE
+    if high.any():
+        symbols[high] = np.where(code_points[high] < 0x1F000, FOREIGN, 0)
+    return symbols, starts
+
+
+def trigram_ids(symbols: np.ndarray) -> np.ndarray:
+    s = symbols.astype(np.uint16)
+    return s[:-2] * (SIZE * SIZE) + s[1:-1] * SIZE + s[2:]
+
+
+def trigram_text(tid: int) -> str:
+    return SYMBOLS[tid // (SIZE * SIZE)] + SYMBOLS[tid // SIZE % SIZE] + SYMBOLS[tid % SIZE]
+
+
+def build_profiles(corpora: Dict[str, str]) -> Dict:
+    """Trigram counts per language code from training text, in the lang_profiles.json format."""
+    profiles = {}
+    for code, text in corpora.items():
+        symbols, _ = encode([text])
+        counts = np.bincount(trigram_ids(symbols), minlength=SIZE ** 3)
+        counts[0] = 0  # runs of boundaries
+        profiles[code] = {trigram_text(int(t)): int(counts[t]) for t in np.flatnonzero(counts)}
+    return {"symbols": SYMBOLS, "profiles": profiles}
+
+
+def load_profiles(path: str = PROFILES_PATH) -> Dict[str, np.ndarray]:
+    """Log-probability table over all trigram IDs for each language code."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data["symbols"] != SYMBOLS:
+        raise ValueError(f"{path} was built for another alphabet; rebuild it with: python lang_id.py build")
+    tables = {}
+    for code, counts in data["profiles"].items():
+        table = np.full(SIZE ** 3, SMOOTHING, dtype=np.float64)
+        for tri, n in counts.items():
+            table[SYMBOLS.index(tri[0]) * SIZE * SIZE + SYMBOLS.index(tri[1]) * SIZE + SYMBOLS.index(tri[2])] += n
+        table = np.log(table / table.sum())
+        table[0] = 0.0  # runs of boundaries carry no evidence
+        tables[code] = table.astype(np.float32)
+    return tables
+
+
+_TABLES: Dict[str, np.ndarray] = {}
+
+
+def detect(texts: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """Return ([label per text], confidence per text as a float array)."""
+    if not _TABLES:
+        _TABLES.update(load_profiles())
+    n_texts = len(texts)
+    if n_texts == 0:
+        return [], np.zeros(0)
+    codes = list(_TABLES)
+    symbols, starts = encode(texts)
+    tri = trigram_ids(symbols)
+    # Each text's trigrams are contiguous (it owns those starting in its padded span), so sums per text and
+    # per window are reduceat() over segment starts; every text has at least its two padding symbols
+    text_starts = starts[:-1]
+    lengths = np.diff(starts)
+    windows = -(-lengths // CHUNK_SYMBOLS)
+    chunk_owner = np.repeat(np.arange(n_texts), windows)
+    first_chunk = np.cumsum(windows) - windows
+    chunk_starts = text_starts[chunk_owner] + (np.arange(len(chunk_owner)) - first_chunk[chunk_owner]) * CHUNK_SYMBOLS
+
+    evidence = (tri != 0).astype(np.float32)
+    count = np.add.reduceat(evidence, text_starts).astype(np.float64)
+    chunk_count = np.add.reduceat(evidence, chunk_starts).astype(np.float64)
+    score_rows, chunk_rows = [], []
+    for code in codes:
+        weights = _TABLES[code][tri]
+        score_rows.append(np.add.reduceat(weights, text_starts))
+        chunk_rows.append(np.add.reduceat(weights, chunk_starts))
+    # A label scores as its best profile, so the margin is between labels (German vs French is no doubt)
+    label_names = list(dict.fromkeys(LANGUAGES[code] for code in codes))
+    members = [[i for i, code in enumerate(codes) if LANGUAGES[code] == name] for name in label_names]
+    profile_scores, profile_chunk_scores = np.stack(score_rows), np.stack(chunk_rows)
+    scores = np.stack([profile_scores[m].max(axis=0) for m in members]).astype(np.float64)
+    chunk_scores = np.stack([profile_chunk_scores[m].max(axis=0) for m in members])
+
+    best = scores.argmax(axis=0)
+    ranked = np.sort(scores, axis=0)
+    margin = (ranked[-1] - ranked[-2]) / np.maximum(count, 1)  # nats per trigram between the two best
+    confidence = 1.0 - 0.5 * np.exp(-margin * np.minimum(count, EVIDENCE_CAP) * CONFIDENCE_SCALE)
+    # Share of the text whose window prefers another language than the text as a whole
+    agrees = chunk_scores.argmax(axis=0) == best[chunk_owner]
+    minority = 1.0 - np.add.reduceat(chunk_count * agrees, first_chunk) / np.maximum(count, 1)
+    confidence = np.minimum(confidence, 1.0 - minority)
+
+    letters = np.add.reduceat((symbols[:-2] > 0).astype(np.int32), text_starts)
+    foreign = np.add.reduceat((symbols[:-2] == FOREIGN).astype(np.int32), text_starts)
+    foreign_share = foreign / np.maximum(letters, 1)
+
+    labels = [label_names[b] for b in best]
+    for i in np.flatnonzero(foreign_share > FOREIGN_SHARE):
+        labels[i] = OTHER
+        confidence[i] = foreign_share[i]
+    confidence[count == 0] = 0.0
+    return labels, confidence
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["build"] and all("=" in a for a in args[1:]):
+        corpora = {}
+        sources = args[1:] or [f"{code}={os.path.join(CORPUS_DIR, code + '.txt')}" for code in LANGUAGES]
+        for arg in sources:
+            code, path = arg.split("=", 1)
+            if code not in LANGUAGES:
+                sys.exit(f"unknown profile code {code!r}; expected one of {', '.join(LANGUAGES)}")
+            with open(path, "r", encoding="utf-8") as f:
+                corpora[code] = f.read()
+        with open(PROFILES_PATH, "w", encoding="utf-8") as f:
+            json.dump(build_profiles(corpora), f, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+            f.write("\n")
+        print(f"Wrote {PROFILES_PATH}")
+    elif args and args[0] != "build":
+        labels, confidence = detect(args)
+        for text, label, conf in zip(args, labels, confidence):
+            print(f"{label:<8} {conf:.3f}  {text[:70]}")
+    else:
+        print("usage: python lang_id.py TEXT... | build [CODE=TRAINING_TEXT...]", file=sys.stderr)
+        sys.exit(2)
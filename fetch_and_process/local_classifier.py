@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local CPU-only pre-classifier for the LLM labels.
+
+One TF-IDF (word 1-2 grams plus character 3-5 grams) + logistic regression
+model per label field is trained from the rows Gemini already labeled. analytics.py
+runs it before calling Gemini: rows where every local prediction is at least
+as confident as its threshold are labeled locally, and only the rest go to the
+API. Each label field records where its value came from in <field>_source
+("llm", "local" or "cluster"); values not given by the LLM are never used as
+training data, so the model does not learn from its own output.
+
+Training holds out HOLDOUT of the LLM-labeled rows and reports, per confidence
+threshold, the share of rows the model would label (coverage) and how often it
+agrees with Gemini on them; the saved model is then refit on all rows.
+
+    python local_classifier.py train     # train from the dataset store and print the agreement report
+    python local_classifier.py report    # print the report of the saved model
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline, make_union
+except ImportError:  # optional: without scikit-learn every row goes to the LLM
+    joblib = None
+
+MODEL_PATH = "data/local_classifier.joblib"
+FIELDS = ["stance", "identifies_as_immigrant"]  # language comes from lang_id
+SOURCE_COLUMN = "label_source"  # Source of all fields of rows labeled before there were per-field sources
+HOLDOUT = 0.2
+MIN_TRAIN_ROWS = 200  # Per field; fewer LLM labels than this and the field gets no model
+THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 0.95, 0.98)
+SEED = 0
+
+
+def available() -> bool:
+    return joblib is not None
+
+
+def row_texts(df: pd.DataFrame) -> List[str]:
+    """qna_text plus a differing qna per row, like the text analytics.py sends to the LLM."""
+    empty = pd.Series("", index=df.index)
+    qna_text = df["qna_text"].fillna("").astype(str).str.strip() if "qna_text" in df.columns else empty
+    qna = df["qna"].fillna("").astype(str).str.strip() if "qna" in df.columns else empty
+    return (qna_text + " " + qna.where(qna != qna_text, "")).str.strip().tolist()
+
+
+def source_column(field: str) -> str:
+    """Column with the source of field's value: "llm", "local" or "cluster"."""
+    return f"{field}_source"
+
+
+def field_source(df: pd.DataFrame, field: str) -> pd.Series:
+    """Source of every row's value for field; missing means the LLM (labeled before sources were kept)."""
+    source = pd.Series(None, index=df.index, dtype=object)
+    for column in (source_column(field), SOURCE_COLUMN):
+        if column in df.columns:
+            source = source.where(source.notna(), df[column])
+    return source
+
+
+def llm_labeled(df: pd.DataFrame, field: str) -> pd.DataFrame:
+    """Rows with an LLM-given value for field (training data)."""
+    mask = df[field].notna() if field in df.columns else pd.Series(False, index=df.index)
+    source = field_source(df, field)
+    return df[mask & (source.isna() | (source == "llm"))]
+
+
+def build_model():
+    features = make_union(
+        TfidfVectorizer(analyzer="word", ngram_range=(1, 2), min_df=2, sublinear_tf=True, lowercase=True),
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), min_df=2, sublinear_tf=True, lowercase=True,
+                        max_features=200_000),
+    )
+    return make_pipeline(features, LogisticRegression(C=4.0, max_iter=2000, class_weight="balanced"))
+
+
+def agreement_report(truth: Sequence[str], predicted: Sequence[str], confidence: np.ndarray) -> Dict:
+    """Agreement with the LLM overall and on the rows at or above each confidence threshold."""
+    agree = np.asarray(predicted) == np.asarray(truth)
+    by_threshold = []
+    for t in THRESHOLDS:
+        taken = confidence >= t
+        by_threshold.append({
+            "threshold": t,
+            "coverage": round(float(taken.mean()), 4) if len(taken) else 0.0,
+            "agreement": round(float(agree[taken].mean()), 4) if taken.any() else None,
+        })
+    return {"rows": len(agree), "agreement": round(float(agree.mean()), 4) if len(agree) else None,
+            "by_threshold": by_threshold}
+
+
+def train(df: pd.DataFrame, fields: List[str] = FIELDS) -> Tuple[Dict, Dict]:
+    """Fit one model per field on the LLM-labeled rows of df; returns (models, report)."""
+    if not available():
+        raise RuntimeError("scikit-learn is not installed (pip install scikit-learn)")
+    models, report = {}, {"trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "fields": {}}
+    for field in fields:
+        rows = llm_labeled(df, field)
+        labels = rows[field].astype(str)
+        if len(rows) < MIN_TRAIN_ROWS or labels.nunique() < 2:
+            print(f"  {field}: only {len(rows)} LLM-labeled rows ({labels.nunique()} classes); no model")
+            continue
+        texts = row_texts(rows)
+        # Stratify when every class has enough rows for both sides of the split
+        stratify = labels if labels.value_counts().min() >= 2 else None
+        train_x, test_x, train_y, test_y = train_test_split(texts, labels, test_size=HOLDOUT, random_state=SEED,
+                                                            stratify=stratify)
+        model = build_model().fit(train_x, train_y)
+        predicted, confidence = _predict(model, test_x)
+        field_report = agreement_report(test_y.tolist(), predicted, confidence)
+        field_report["train_rows"] = len(rows)
+        field_report["classes"] = labels.value_counts().to_dict()
+        report["fields"][field] = field_report
+        # The deployed model learns from every labeled row
+        models[field] = build_model().fit(texts, labels)
+    return models, report
+
+
+def _predict(model, texts: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    proba = model.predict_proba(list(texts))
+    return model.classes_[proba.argmax(axis=1)].tolist(), proba.max(axis=1)
+
+
+class LocalClassifier:
+    def __init__(self, models: Dict, report: Dict):
+        self.models = models
+        self.report = report
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.models)
+
+    def predict(self, field: str, texts: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Return ([label per text], confidence per text)."""
+        return _predict(self.models[field], texts)
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        joblib.dump({"models": self.models, "report": self.report}, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> Optional["LocalClassifier"]:
+        """The saved classifier, or None when there is none (or scikit-learn is missing)."""
+        if not available() or not os.path.exists(path):
+            return None
+        data = joblib.load(path)
+        return cls(data["models"], data["report"])
+
+    def age_days(self) -> float:
+        trained = datetime.fromisoformat(self.report["trained_at"])
+        return (datetime.now(timezone.utc) - trained).total_seconds() / 86400
+
+
+def print_report(report: Dict) -> None:
+    print(f"Trained at {report['trained_at']}; agreement with the LLM on {HOLDOUT:.0%} held-out rows:")
+    for field, r in report["fields"].items():
+        print(f"  {field}: {r['train_rows']} labeled rows {r['classes']}, held-out agreement {r['agreement']:.1%}")
+        for t in r["by_threshold"]:
+            agreement = f"{t['agreement']:.1%}" if t["agreement"] is not None else "-"
+            print(f"    confidence >= {t['threshold']:<4}  labels {t['coverage']:>6.1%} of rows  agreement {agreement}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args == ["train"]:
+        from dataset_store import read_dataset
+        models, report = train(read_dataset())
+        if not models:
+            sys.exit("Not enough LLM-labeled rows to train any field")
+        LocalClassifier(models, report).save()
+        print_report(report)
+        print(f"Saved {MODEL_PATH}")
+    elif args == ["report"]:
+        classifier = LocalClassifier.load()
+        if classifier is None:
+            sys.exit(f"No model at {MODEL_PATH} (or scikit-learn is not installed)")
+        print_report(classifier.report)
+    else:
+        print("usage: python local_classifier.py train | report", file=sys.stderr)
+        sys.exit(2)
@@ -1,154 +1,241 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import asyncio
 import aiohttp
 import async_timeout
 import time
 import json
-import csv
 import sys
 import os
-import re
-from typing import List, Dict
-from typing import Set
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import dataset_store
+import html_parsers
+import jsonl_store
+from html_archive import ARCHIVE_DIR, HtmlArchive, content_hash
+from html_parsers import get_parser
+from rate_control import RateController
+from scrape_metrics import ScrapeMetrics, timed_call
+from seen_state import SeenStore, utc_now
 
 BASE = "https://internetconsultatie.nl"
-CONSULTATION_SLUG = "naturalisatietermijn"
-LIST_ROOT = f"{BASE}/{CONSULTATION_SLUG}/reacties"
+CONSULTATION_SLUG = "naturalisatietermijn"  # Default consultation; pass --consultation SLUG (repeatable) for others
 PER_PAGE = 100
-STATE_FILE = "data/natur_reacties_seen.json"
+# Files of the default consultation; other consultations keep theirs under data/<slug>/ (see Consultation)
+SEEN_DB = "data/natur_reacties_seen.sqlite"
+LEGACY_STATE_FILE = "data/natur_reacties_seen.json"  # imported into SEEN_DB the first time it is created
+FAILED_FILE = "data/natur_reacties_failed.json"  # dead-letter items, retried first on the next run
+JSONL_PATH = "data/natur_reacties_full.jsonl"
+METRICS_FILE = "data/scrape_metrics.json"  # JSON run report: latency histograms, statuses, retries, bytes
+PROMETHEUS_FILE = None  # e.g. "data/scrape_metrics.prom" to also export the run in Prometheus text format
+ARCHIVE_HTML = False  # keep gzip copies of every fetched page in ARCHIVE_DIR (enables --replay); also --archive
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; ResearchBot/1.0; +https://example.org/bot) "
                   "AsyncScraper/2025-10-01"
 }
 TIMEOUT = 20
-MAX_CONCURRENCY = 5   # at most 5 requests in flight (reduced to be more respectful)
-BATCH_SIZE = 50      # Process items in batches
+# Request pacing is adaptive (see rate_control.py): concurrency starts at INITIAL_CONCURRENCY,
+# grows while responses are fast and is halved on 429/503, timeouts or slow responses.
+# There is one controller per host, so consultations scraped together share its budget.
+INITIAL_CONCURRENCY = 5
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+INITIAL_DELAY = 0.2   # seconds between request starts; shrinks/grows with server feedback
+TARGET_LATENCY = 3.0  # responses slower than this count as congestion
+BATCH_SIZE = 50      # Results are persisted (and progress reported) every BATCH_SIZE fetched items
+QUEUE_SIZE = 200     # Discovered items buffered ahead of the fetch workers
+PARSER_BACKEND = "auto"  # "lxml", "bs4" or "auto" (lxml when installed); see html_parsers.py
+PARSE_WORKERS = min(4, os.cpu_count() or 1)  # Parser processes/threads; 0 parses inline on the event loop
+PARSE_EXECUTOR = "process"  # "process" scales across cores; "thread" avoids process start-up for small runs
+DISCOVERY_WINDOW = 5  # Listing pages requested concurrently during discovery
+STOP_AFTER_SEEN_PAGES = 1  # Stop discovery after N consecutive fully-seen pages (0 = walk every page)
+MAX_ATTEMPTS = 4        # Fetch attempts per item before it goes to the dead-letter file
+MAX_FAILURES = 5        # Runs an item may fail in before it is dropped from the dead-letter file
+RETRY_BASE_DELAY = 1.0  # Backoff before retry n is uniform(0, RETRY_BASE_DELAY * 2**(n-1)) seconds
+RETRY_MAX_DELAY = 30.0
+
+PARSER = get_parser(PARSER_BACKEND)
 
 
 # ------------------------------
-# State management for incremental scraping
+# Consultations
 # ------------------------------
-def load_seen_ids() -> Set[str]:
-    """Load previously seen detail_relative IDs from state file."""
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return set(json.load(f))
-    return set()
+@dataclass
+class Consultation:
+    """One consultation's listing root and its own seen-state, dead-letter, JSONL and dataset paths."""
+    slug: str
+    list_root: str
+    seen_db: str
+    failed_file: str
+    jsonl_path: str
+    dataset_dir: str
+    legacy_state_file: Optional[str] = None
+
+    @classmethod
+    def for_slug(cls, slug: str) -> "Consultation":
+        list_root = f"{BASE}/{slug}/reacties"
+        if slug == CONSULTATION_SLUG:
+            # The original single-consultation file layout
+            return cls(slug, list_root, SEEN_DB, FAILED_FILE, JSONL_PATH, dataset_store.DATASET_DIR,
+                       LEGACY_STATE_FILE)
+        root = os.path.join("data", slug)
+        return cls(slug, list_root, os.path.join(root, "seen.sqlite"), os.path.join(root, "failed.json"),
+                   os.path.join(root, "reacties.jsonl"), os.path.join(root, "reacties"))
 
 
-def save_seen_ids(ids: Set[str]) -> None:
-    """Save seen detail_relative IDs to state file."""
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(sorted(list(ids)), f, ensure_ascii=False, indent=2)
+# ------------------------------
+# State management for incremental scraping
+# ------------------------------
+def load_failed_items(path: str) -> List[Dict]:
+    """Load dead-letter records ({item, error, failures, last_failed_at}) from previous runs."""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return []
+
+
+def save_failed_items(path: str, records: List[Dict]) -> None:
+    """Save dead-letter records; an empty list removes the file."""
+    if not records:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def update_failed_items(previous: List[Dict], results: List[Dict]) -> List[Dict]:
+    """
+    Drop dead-letter records that were fetched successfully and add/refresh the ones that failed.
+    Items that cannot succeed on retry (e.g. a removed reaction) or failed MAX_FAILURES runs are dropped too.
+    """
+    by_id = {rec["item"]["detail_relative"]: rec for rec in previous}
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for r in results:
+        key = r["detail_relative"]
+        if "_fetch_error" not in r:
+            by_id.pop(key, None)
+            continue
+        failures = by_id[key]["failures"] + 1 if key in by_id else 1
+        if not r.get("_retryable", True) or failures >= MAX_FAILURES:
+            by_id.pop(key, None)
+            print(f"    ! Giving up on {key} after {failures} failed runs: {r['_fetch_error']}", file=sys.stderr)
+            continue
+        item = {k: v for k, v in r.items() if k in LIST_FIELDS}
+        by_id[key] = {"item": item, "error": r["_fetch_error"], "failures": failures, "last_failed_at": now}
+    return list(by_id.values())
 
 
 # ------------------------------
 # Async Fetch Helpers
 # ------------------------------
-async def fetch(session: aiohttp.ClientSession, url: str) -> str:
-    async with async_timeout.timeout(TIMEOUT):
-        async with session.get(url, ssl=True) as resp:
-            resp.raise_for_status()
-            return await resp.text()
-
-
-def detect_last_page(soup: BeautifulSoup) -> int:
-    last_page = 1
-    nav = soup.select_one("div.pagination div.pagination__index ul")
-    if not nav:
-        return last_page
-    for a in nav.find_all("a"):
-        m = re.search(r"/reacties/(?:datum|naam)/(\d+)", a.get("href", ""))
-        if m:
-            last_page = max(last_page, int(m.group(1)))
-    return last_page
-
-
-def parse_list_items(soup: BeautifulSoup) -> List[Dict]:
-    out = []
-    box = soup.select_one("div.result--list ul")
-    if not box:
-        return out
-    for li in box.find_all("li", recursive=False):
-        a = li.find("a")
-        p = li.find("p")
-        if not a:
-            continue
-        name = a.get_text(strip=True)
-        href = a.get("href", "").strip()
-        abs_link = urljoin(BASE, href)
-        place, date_time = None, None
-        if p:
-            txt = p.get_text(" ", strip=True)
-            if " | " in txt:
-                place, date_time = txt.split(" | ", 1)
-            else:
-                place = txt
-        out.append({
-            "list_name": name,
-            "list_place": place,
-            "list_date_time": date_time,
-            "detail_relative": href,
-            "detail_url": abs_link,
-        })
-    return out
+@dataclass
+class FetchContext:
+    """Everything a fetch needs: the HTTP session, pacing, the parse pool, the optional page archive and metrics."""
+    session: aiohttp.ClientSession
+    rate: RateController
+    executor: Optional[Executor] = None
+    archive: Optional[HtmlArchive] = None
+    metrics: Optional[ScrapeMetrics] = None
+
+
+async def fetch(session: aiohttp.ClientSession, url: str, metrics: Optional[ScrapeMetrics] = None,
+                kind: str = "page") -> str:
+    started = time.perf_counter()
+    status, nbytes = None, 0
+    try:
+        async with async_timeout.timeout(TIMEOUT):
+            async with session.get(url, ssl=True) as resp:
+                status = resp.status
+                resp.raise_for_status()
+                nbytes = len(await resp.read())  # text() decodes the body read here
+                return await resp.text()
+    except Exception as e:
+        if metrics is not None:
+            metrics.count_error(e)
+        raise
+    finally:
+        if metrics is not None:
+            metrics.observe_fetch(kind, time.perf_counter() - started, status, nbytes)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Client errors other than 408/429 (e.g. a removed reaction) will not succeed on retry."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return not (400 <= exc.status < 500) or exc.status in (408, 429)
+    return True
+
+
+async def paced_fetch(ctx: FetchContext, url: str, kind: str) -> str:
+    """Fetch through the rate controller so latency and throttling feed back into pacing."""
+    waiting = time.perf_counter()
+    async with ctx.rate.request():
+        if ctx.metrics is not None:
+            ctx.metrics.observe_slot_wait(time.perf_counter() - waiting)
+        return await fetch(ctx.session, url, ctx.metrics, kind)
+
+
+async def archive_page(ctx: FetchContext, url: str, html: str, kind: str, sha256: Optional[str] = None) -> None:
+    """Store the page in the archive (when enabled) in a thread, so compression and file writes stay off the loop."""
+    if ctx.archive is not None:
+        await asyncio.to_thread(ctx.archive.put, url, html, kind, sha256)
+
+
+def detect_last_page(html: str) -> int:
+    return PARSER.detect_last_page(html)
+
+
+LIST_FIELDS = ("list_name", "list_place", "list_date_time", "detail_relative", "detail_url")
+
+
+def parse_list_items(html: str) -> List[Dict]:
+    return PARSER.parse_list_items(html, BASE)
 
 
 def parse_detail_html(html: str) -> Dict:
-    soup = BeautifulSoup(html, "html.parser")
-    data = {
-        "detail_naam": None,
-        "detail_plaats": None,
-        "detail_datum": None,
-        "qna": [],
-        "raw_html_length": len(html),
-    }
+    return PARSER.parse_detail_html(html)
 
-    table = soup.select_one("table.table__data-overview")
-    if table:
-        for tr in table.select("tr"):
-            th, td = tr.find("th"), tr.find("td")
-            if not th or not td:
-                continue
-            key = th.get_text(" ", strip=True).lower()
-            val = td.get_text(" ", strip=True)
-            if key == "naam":
-                data["detail_naam"] = val
-            elif key == "plaats":
-                data["detail_plaats"] = val
-            elif key == "datum":
-                data["detail_datum"] = val
-
-    content_root = soup.select_one('div.container[role="main"]#content')
-    if content_root:
-        for h3 in content_root.find_all("h3"):
-            vraag = h3.get_text(" ", strip=True)
-            blockquote = h3.find_next("blockquote")
-            if blockquote:
-                antwoord = blockquote.get_text("\n", strip=True)
-                data["qna"].append({"vraag": vraag, "antwoord": antwoord})
-
-    return data
-
-
-async def fetch_detail(sem: asyncio.Semaphore, session: aiohttp.ClientSession, item: Dict) -> Dict:
-    url = item["detail_url"]
-    async with sem:
-        try:
-            # Small delay to be respectful to the server
-            await asyncio.sleep(0.2)  # Increased delay
-            html = await fetch(session, url)
-            detail = parse_detail_html(html)
-        except Exception as e:
-            error_msg = str(e) if str(e) else "Unknown error"
-            print(f"    ! Error fetching {url}: {type(e).__name__}: {error_msg}", file=sys.stderr)
-            detail = {"detail_naam": None, "detail_plaats": None, "detail_datum": None, "qna": [], "raw_html_length": 0}
 
+def make_parse_executor() -> Optional[Executor]:
+    if PARSE_WORKERS <= 0:
+        return None
+    if PARSE_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=PARSE_WORKERS)
+    return ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+
+
+async def parse_off_loop(executor: Optional[Executor], fn, *args):
+    """Run a CPU-bound parse function in the executor so the event loop keeps serving sockets."""
+    if executor is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def timed_parse(ctx: FetchContext, kind: str, fn, *args):
+    """parse_off_loop() that records the parse time measured inside the worker (excluding queueing)."""
+    result, seconds = await parse_off_loop(ctx.executor, timed_call, fn, *args)
+    if ctx.metrics is not None:
+        ctx.metrics.observe_parse(kind, seconds)
+    return result
+
+
+def failed_result(item: Dict, error: str, retryable: bool = True) -> Dict:
+    """Result for an item that could not be fetched; it is dead-lettered (when retryable) instead of written out."""
+    return {**item, "_fetch_error": error, "_retryable": retryable}
+
+
+def build_result(item: Dict, detail: Dict) -> Dict:
+    """Combine a listing item with its parsed detail page into one output row."""
     qna_flat = [f"{q['vraag']}: {q['antwoord']}" for q in detail.get("qna", [])]
     return {
         **item,
@@ -162,158 +249,413 @@ async def fetch_detail(sem: asyncio.Semaphore, session: aiohttp.ClientSession, i
     }
 
 
-async def process_batch(session: aiohttp.ClientSession, sem: asyncio.Semaphore, batch: List[Dict], batch_num: int) -> List[Dict]:
-    """Process a batch of items."""
-    print(f"  Processing batch {batch_num} ({len(batch)} items)...", file=sys.stderr)
-    tasks = [fetch_detail(sem, session, item) for item in batch]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # Handle exceptions
-    actual_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            print(f"    ! Batch {batch_num} item {i} failed: {type(result).__name__}: {result}", file=sys.stderr)
-            # Create a dummy result for failed items
-            item = batch[i]
-            actual_results.append({
-                **item,
-                "detail_naam": None,
-                "detail_plaats": None, 
-                "detail_datum": None,
-                "qna_text": "",
-                "qna_count": 0,
-                "raw_html_length": 0,
-                "_qna_structured": [],
-            })
-        else:
-            actual_results.append(result)
-    
-    successful = sum(1 for r in actual_results if r.get("raw_html_length", 0) > 0)
-    print(f"  Batch {batch_num} complete: {successful}/{len(actual_results)} successful", file=sys.stderr)
-    
-    return actual_results
+async def with_retries(ctx: FetchContext, url: str, attempt_once: Callable[[], Awaitable]):
+    """
+    Await attempt_once() up to MAX_ATTEMPTS times, backing off between attempts; the last error is re-raised.
+
+    Used for listing and detail pages alike, so a 429 on either is retried the same way.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return await attempt_once()
+        except Exception as e:
+            error_msg = str(e) if str(e) else "Unknown error"
+            error = f"{type(e).__name__}: {error_msg}"
+            if attempt == MAX_ATTEMPTS or not is_retryable(e):
+                print(f"    ! Error fetching {url} (attempt {attempt}/{MAX_ATTEMPTS}, giving up): {error}", file=sys.stderr)
+                raise
+            # Exponential backoff with full jitter; Retry-After is handled by the rate controller
+            backoff = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+            print(f"    ! Error fetching {url} (attempt {attempt}/{MAX_ATTEMPTS}, retrying in {backoff:.1f}s): {error}",
+                  file=sys.stderr)
+            if ctx.metrics is not None:
+                ctx.metrics.count_retry()
+            await asyncio.sleep(backoff)
+
+
+async def fetch_detail(ctx: FetchContext, item: Dict) -> Dict:
+    url = item["detail_url"]
+
+    async def attempt_once() -> Tuple[str, str, Dict]:
+        html = await paced_fetch(ctx, url, "detail")
+        fetched_at, sha256 = utc_now(), content_hash(html)
+        await archive_page(ctx, url, html, "detail", sha256)
+        return fetched_at, sha256, await timed_parse(ctx, "detail", html_parsers.parse_detail_html, html,
+                                                     PARSER_BACKEND)
+
+    try:
+        fetched_at, sha256, detail = await with_retries(ctx, url, attempt_once)
+    except Exception as e:
+        return failed_result(item, f"{type(e).__name__}: {str(e) if str(e) else 'Unknown error'}", is_retryable(e))
+
+    return {
+        **build_result(item, detail),
+        "_fetched_at": fetched_at,
+        "_content_hash": sha256,
+    }
+
+
+async def fetch_worker(ctx: FetchContext, items: asyncio.Queue, results: asyncio.Queue) -> None:
+    """Consume items until a None sentinel arrives and push one result per item."""
+    while True:
+        item = await items.get()
+        if item is None:
+            return
+        try:
+            result = await fetch_detail(ctx, item)
+        except Exception as e:
+            print(f"    ! Item {item['detail_relative']} failed: {type(e).__name__}: {e}", file=sys.stderr)
+            result = failed_result(item, f"{type(e).__name__}: {e}")
+        if ctx.metrics is not None:
+            ctx.metrics.count_item("_fetch_error" not in result)
+        await results.put(result)
+
+
+def persist_batch(consultation: Consultation, batch: List[Dict], seen: SeenStore,
+                  failed_records: List[Dict]) -> List[Dict]:
+    """
+    Write one batch of results to the dataset store and JSONL, then commit it to the seen-state.
+
+    The seen-state is committed last, so a crash in between only means the batch is fetched
+    again on the next run (readers keep the latest row per detail_relative). Returns the
+    updated dead-letter records.
+    """
+    results = [r for r in batch if "_fetch_error" not in r]
+    if results:
+        dataset_store.append_rows(results, consultation.dataset_dir)
+        write_jsonl(consultation.jsonl_path, results, mode="a")
+    failed_records = update_failed_items(failed_records, batch)
+    save_failed_items(consultation.failed_file, failed_records)
+    seen.add_many((r["detail_relative"], r.get("_fetched_at"), r.get("_content_hash")) for r in results)
+    return failed_records
+
+
+async def collect_results(consultation: Consultation, rate: RateController, results: asyncio.Queue,
+                          seen: SeenStore, failed_records: List[Dict]) -> Tuple[int, int, List[Dict]]:
+    """
+    Drain parsed results as they finish and persist them every BATCH_SIZE results.
+
+    Only the current batch is held in memory. Returns (fetched, successful, dead-letter records).
+    """
+    batch: List[Dict] = []
+    fetched, successful = 0, 0
+    while True:
+        result = await results.get()
+        if result is not None:
+            batch.append(result)
+            fetched += 1
+            successful += "_fetch_error" not in result
+        if batch and (result is None or len(batch) >= BATCH_SIZE):
+            # File and SQLite writes run in a thread so workers keep fetching meanwhile
+            failed_records = await asyncio.to_thread(persist_batch, consultation, batch, seen, failed_records)
+            batch = []
+            print(f"  [{consultation.slug}] Saved {fetched} items ({successful} successful, {rate.describe()})", file=sys.stderr)
+        if result is None:
+            return fetched, successful, failed_records
+
+
+# ------------------------------
+# Listing discovery
+# ------------------------------
+def list_page_url(list_root: str, page: int) -> str:
+    return f"{list_root}/datum/{page}/{PER_PAGE}"
+
+
+async def fetch_list_page(ctx: FetchContext, list_root: str, page: int) -> str:
+    url = list_page_url(list_root, page)
+    print(f"Listing: {url}", file=sys.stderr)
+
+    async def attempt_once() -> str:
+        html = await paced_fetch(ctx, url, "list")
+        await archive_page(ctx, url, html, "list")
+        return html
+
+    return await with_retries(ctx, url, attempt_once)
+
+
+async def discover_new_items(ctx: FetchContext, list_root: str, is_known: Callable[[str], bool],
+                             queue: asyncio.Queue, stop_after_seen_pages: int = STOP_AFTER_SEEN_PAGES
+                             ) -> Tuple[int, int]:
+    """
+    Walk the listing pages under list_root (sorted newest first by datum) and queue items for which is_known() is False.
+
+    Pages are requested DISCOVERY_WINDOW at a time through the shared rate controller, but
+    examined in page order so that discovery stops as soon as stop_after_seen_pages
+    consecutive pages contain nothing new. New items are put on the queue as soon as their
+    page is parsed so fetch workers can start immediately.
+    Returns (new_items_queued, total_items_listed).
+    """
+    html1 = await fetch_list_page(ctx, list_root, 1)
+    last_page = detect_last_page(html1)
+    print(f"Detected {last_page} pages under {list_root}.", file=sys.stderr)
+
+    new_count = 0
+    total_items_found = 0
+    seen_streak = 0
+
+    async def consume(page: int, items: List[Dict]) -> bool:
+        """Queue one page of new items; return True when discovery may stop."""
+        nonlocal new_count, total_items_found, seen_streak
+        total_items_found += len(items)
+        fresh = [item for item in items if not is_known(item["detail_relative"])]
+        for item in fresh:
+            await queue.put(item)
+        new_count += len(fresh)
+        seen_streak = 0 if fresh else seen_streak + 1
+        if stop_after_seen_pages and seen_streak >= stop_after_seen_pages:
+            print(f"{seen_streak} fully-seen page(s) up to page {page}; stopping discovery "
+                  f"({last_page - page} pages skipped).", file=sys.stderr)
+            return True
+        return False
+
+    if await consume(1, await timed_parse(ctx, "list", html_parsers.parse_list_items, html1, BASE, PARSER_BACKEND)):
+        return new_count, total_items_found
+
+    for window_start in range(2, last_page + 1, DISCOVERY_WINDOW):
+        pages = list(range(window_start, min(window_start + DISCOVERY_WINDOW, last_page + 1)))
+        pages_html = await asyncio.gather(*(fetch_list_page(ctx, list_root, page) for page in pages))
+        for page, html in zip(pages, pages_html):
+            items = await timed_parse(ctx, "list", html_parsers.parse_list_items, html, BASE, PARSER_BACKEND)
+            if await consume(page, items):
+                return new_count, total_items_found
+
+    return new_count, total_items_found
 
 
 # ------------------------------
 # Main
 # ------------------------------
-async def main_async():
-    connector = aiohttp.TCPConnector(limit=20)
-    sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    
-    # Load previously seen IDs for incremental scraping
-    seen_ids = load_seen_ids()
-    new_seen_ids = set(seen_ids)
-    print(f"Loaded {len(seen_ids)} previously seen IDs from state file", file=sys.stderr)
-    
-    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
-        # First page to detect number of pages
-        first_url = f"{BASE}/{CONSULTATION_SLUG}/reacties/datum/1/{PER_PAGE}"
-        html1 = await fetch(session, first_url)
-        soup1 = BeautifulSoup(html1, "html.parser")
-        last_page = detect_last_page(soup1)
-        print(f"Detected {last_page} pages.", file=sys.stderr)
-
-        all_items: List[Dict] = []
-        total_items_found = 0
-        for page in range(1, last_page + 1):
-            list_url = f"{BASE}/{CONSULTATION_SLUG}/reacties/datum/{page}/{PER_PAGE}"
-            print(f"Listing: {list_url}", file=sys.stderr)
-            html = await fetch(session, list_url)
-            soup = BeautifulSoup(html, "html.parser")
-            items = parse_list_items(soup)
-            total_items_found += len(items)
-            
-            # Filter out already seen items
-            for item in items:
-                if item["detail_relative"] in seen_ids:
-                    continue   # skip old ones
-                all_items.append(item)
-                new_seen_ids.add(item["detail_relative"])
-
-        print(f"Found {total_items_found} total items, {len(all_items)} new items to fetch (previously seen: {len(seen_ids)})", file=sys.stderr)
-
-        if not all_items:
-            print("No new items to process.", file=sys.stderr)
-            return
+def make_rate_controller() -> RateController:
+    return RateController(
+        initial_concurrency=INITIAL_CONCURRENCY,
+        min_concurrency=MIN_CONCURRENCY,
+        max_concurrency=MAX_CONCURRENCY,
+        initial_delay=INITIAL_DELAY,
+        target_latency=TARGET_LATENCY,
+    )
+
+
+async def scrape_consultation(ctx: FetchContext, consultation: Consultation) -> None:
+    """Discover, fetch and persist the new reactions of one consultation."""
+    tag = f"[{consultation.slug}]"
+
+    # Previously seen IDs for incremental scraping
+    seen = SeenStore(consultation.seen_db, legacy_json=consultation.legacy_state_file)
+    print(f"{tag} Seen-state has {len(seen)} previously fetched IDs ({consultation.seen_db})", file=sys.stderr)
+
+    # Items that failed on earlier runs are retried first and are never in the seen-state
+    failed_records = [rec for rec in load_failed_items(consultation.failed_file)
+                      if rec["item"]["detail_relative"] not in seen]
+    retry_items = [rec["item"] for rec in failed_records]
+    retry_ids = {item["detail_relative"] for item in retry_items}
+    if retry_items:
+        print(f"{tag} Retrying {len(retry_items)} previously failed items from {consultation.failed_file}",
+              file=sys.stderr)
+
+    # A run that was interrupted committed its newest items but may not have reached older
+    # pages, so early stopping would skip them: walk every listing page once to resume.
+    interrupted_run = seen.get_meta("run_started_at")
+    stop_after_seen_pages = STOP_AFTER_SEEN_PAGES
+    if interrupted_run:
+        print(f"{tag} Previous run (started {interrupted_run}) did not finish; checking every listing page",
+              file=sys.stderr)
+        stop_after_seen_pages = 0
+    seen.set_meta("run_started_at", utc_now())
+
+    # Streaming pipeline: discovery -> item queue -> fetch workers -> result queue -> collector.
+    # There is one worker per unit of the rate controller's ceiling, so the controller decides how many are in flight.
+    items_q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    results_q: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        for item in retry_items:
+            await items_q.put(item)
+        new_count, total_items_found = await discover_new_items(
+            ctx, consultation.list_root, lambda key: key in retry_ids or key in seen, items_q,
+            stop_after_seen_pages)
+        print(f"{tag} Found {total_items_found} total items, {new_count} new items to fetch", file=sys.stderr)
+        # Only after a complete discovery; on failure the workers are cancelled instead
+        for _ in range(MAX_CONCURRENCY):
+            await items_q.put(None)
+
+    async def fetch_all() -> None:
+        try:
+            await asyncio.gather(*(fetch_worker(ctx, items_q, results_q) for _ in range(MAX_CONCURRENCY)))
+        finally:
+            await results_q.put(None)
+
+    # Every BATCH_SIZE results are committed as they arrive, so an interrupted run
+    # loses at most the batch in progress and the next run resumes after it
+    stages = [asyncio.ensure_future(produce()), asyncio.ensure_future(fetch_all()),
+              asyncio.ensure_future(collect_results(consultation, ctx.rate, results_q, seen, failed_records))]
+    try:
+        _, _, (fetched, successful, failed_records) = await asyncio.gather(*stages)
+        seen.set_meta("run_started_at", None)
+    finally:
+        # When one stage fails the others are still running; stop them before closing the seen-state they use
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        seen_total = len(seen)
+        seen.close()
+
+    if not fetched:
+        print(f"{tag} No new items to process.", file=sys.stderr)
+        return
+
+    # Only successful fetches are written and marked as seen; failures go to the dead-letter file
+    print(f"{tag} Final results: {successful} successful, {fetched - successful} failed "
+          f"({len(failed_records)} items in {consultation.failed_file})", file=sys.stderr)
+    print(f"{tag} Wrote {successful} rows to {consultation.dataset_dir} and {consultation.jsonl_path}; "
+          f"seen-state has {seen_total} IDs")
+
+
+async def main_async(slugs: Optional[List[str]] = None) -> ScrapeMetrics:
+    """
+    Scrape one or more consultations concurrently over one session, parse pool and page archive.
+    Writes the run's metrics to METRICS_FILE (and PROMETHEUS_FILE when set) and returns them.
+    """
+    consultations = [Consultation.for_slug(slug) for slug in (slugs or [CONSULTATION_SLUG])]
+
+    # One rate controller per host: consultations on the same site share its concurrency budget
+    rates: Dict[str, RateController] = {}
+    for consultation in consultations:
+        host = urlsplit(consultation.list_root).netloc
+        if host not in rates:
+            rates[host] = make_rate_controller()
+    connector = aiohttp.TCPConnector(limit=len(rates) * MAX_CONCURRENCY + 4, limit_per_host=MAX_CONCURRENCY + 4)
+
+    executor = make_parse_executor()
+    if executor is not None:
+        print(f"Parsing in {PARSE_WORKERS} {PARSE_EXECUTOR} worker(s) with the {PARSER.name} backend", file=sys.stderr)
+    archive = HtmlArchive(ARCHIVE_DIR) if ARCHIVE_HTML else None
+    metrics = ScrapeMetrics()
 
-        # Process in batches
-        all_results = []
-        num_batches = (len(all_items) + BATCH_SIZE - 1) // BATCH_SIZE
-        print(f"Processing {len(all_items)} items in {num_batches} batches of {BATCH_SIZE}...", file=sys.stderr)
-        
-        for i in range(0, len(all_items), BATCH_SIZE):
-            batch = all_items[i:i + BATCH_SIZE]
-            batch_num = (i // BATCH_SIZE) + 1
-            
-            batch_results = await process_batch(session, sem, batch, batch_num)
-            all_results.extend(batch_results)
-            
-            # Small delay between batches
-            if i + BATCH_SIZE < len(all_items):
-                print(f"  Pausing 2 seconds before next batch...", file=sys.stderr)
-                await asyncio.sleep(2)
-
-        results = all_results
-
-    # Count successful vs failed fetches
-    successful = sum(1 for r in results if r.get("raw_html_length", 0) > 0)
-    failed = len(results) - successful
-    print(f"Final results: {successful} successful, {failed} failed", file=sys.stderr)
-
-    # Write CSV (merge with existing data properly to avoid column misalignment)
-    csv_path = "data/natur_reacties_full.csv"
-    fieldnames = [
-        "list_name", "list_place", "list_date_time",
-        "detail_relative", "detail_url",
-        "detail_naam", "detail_plaats", "detail_datum",
-        "qna_count", "qna_text", "raw_html_length"
-    ]
-    
-    # Check if CSV exists - if so, use pandas to merge properly
-    csv_exists = os.path.exists(csv_path)
-    if csv_exists:
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
         try:
-            import pandas as pd
-            # Read existing CSV (may have additional columns like stance, language, etc.)
-            existing_df = pd.read_csv(csv_path)
-            # Convert new results to DataFrame
-            new_df = pd.DataFrame([{k: r.get(k, "") for k in fieldnames} for r in results])
-            # Concatenate (pandas will handle column alignment)
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            # Save back
-            combined_df.to_csv(csv_path, index=False)
-            print(f"Merged {len(results)} new rows with {len(existing_df)} existing rows in CSV: {csv_path}")
-        except Exception as e:
-            print(f"Warning: Could not merge with pandas ({e}), using append mode", file=sys.stderr)
-            # Fallback to simple append
-            with open(csv_path, "a", newline="", encoding="utf-8") as f:
-                w = csv.DictWriter(f, fieldnames=fieldnames)
-                for r in results:
-                    w.writerow({k: r.get(k, "") for k in fieldnames})
-            print(f"Appended {len(results)} rows to CSV: {csv_path}")
-    else:
-        # New file - just write it
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=fieldnames)
-            w.writeheader()
-            for r in results:
-                w.writerow({k: r.get(k, "") for k in fieldnames})
-        print(f"Created new CSV with {len(results)} rows: {csv_path}")
-
-    # Write JSONL (append mode)
-    jsonl_path = "data/natur_reacties_full.jsonl"
-    with open(jsonl_path, "a", encoding="utf-8") as f:
+            await asyncio.gather(*(
+                scrape_consultation(
+                    FetchContext(session=session, rate=rates[urlsplit(c.list_root).netloc],
+                                 executor=executor, archive=archive, metrics=metrics),
+                    c)
+                for c in consultations
+            ))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if archive is not None:
+                archive.close()
+        for host, rate in rates.items():
+            print(f"Rate controller for {host}: {rate.describe()}", file=sys.stderr)
+
+    metrics.write_json(METRICS_FILE, extra={
+        "consultations": [c.slug for c in consultations],
+        "rate_controllers": {host: rate.describe() for host, rate in rates.items()},
+        "config": {"max_concurrency": MAX_CONCURRENCY, "parser": PARSER.name, "parse_workers": PARSE_WORKERS,
+                   "parse_executor": PARSE_EXECUTOR},
+    })
+    if PROMETHEUS_FILE:
+        metrics.write_prometheus(PROMETHEUS_FILE)
+    print(f"Metrics: {metrics.summary()} (report in {METRICS_FILE})", file=sys.stderr)
+
+    for consultation in consultations:
+        removed = dataset_store.compact(consultation.dataset_dir)
+        if removed:
+            print(f"Compacted {removed} small part files in {consultation.dataset_dir}")
+    return metrics
+
+
+# ------------------------------
+# Offline replay from the HTML archive
+# ------------------------------
+def parse_archived_detail(archive_root: str, sha256: str) -> Dict:
+    """Load and parse one archived detail page (runs in the parse pool)."""
+    return html_parsers.parse_detail_html(HtmlArchive(archive_root).get(sha256), PARSER_BACKEND)
+
+
+def replay_from_archive(archive: HtmlArchive, consultation: Consultation) -> List[Dict]:
+    """
+    Rebuild one consultation's result rows from archived pages without touching the network.
+
+    Listing snapshots under the consultation's list root supply the list_* fields (the most recent snapshot wins); rows are
+    ordered by when their detail page was first fetched, like the original appends.
+    """
+    items: Dict[str, Dict] = {}
+    for entry in archive.entries("list"):
+        if not entry["url"].startswith(f"{consultation.list_root}/"):
+            continue
+        for item in PARSER.parse_list_items(archive.get(entry["sha256"]), BASE):
+            items[item["detail_relative"]] = item
+
+    first_fetch: Dict[str, int] = {}
+    latest_detail: Dict[str, Dict] = {}
+    for n, entry in enumerate(archive.entries("detail")):
+        first_fetch.setdefault(entry["url"], n)
+        latest_detail[entry["url"]] = entry
+
+    replayable = sorted((item for item in items.values() if item["detail_url"] in latest_detail),
+                        key=lambda item: first_fetch[item["detail_url"]])
+    missing = len(items) - len(replayable)
+    print(f"Archive has {len(items)} listed items; re-parsing {len(replayable)} detail pages "
+          f"({missing} listed items have no archived detail page)", file=sys.stderr)
+
+    shas = [latest_detail[item["detail_url"]]["sha256"] for item in replayable]
+    executor = make_parse_executor()
+    try:
+        if executor is None:
+            details = [parse_archived_detail(archive.root, sha) for sha in shas]
+        else:
+            details = list(executor.map(parse_archived_detail, [archive.root] * len(shas), shas, chunksize=64))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return [build_result(item, detail) for item, detail in zip(replayable, details)]
+
+
+def main_replay(slugs: Optional[List[str]] = None) -> None:
+    archive = HtmlArchive(ARCHIVE_DIR)
+    for consultation in (Consultation.for_slug(slug) for slug in (slugs or [CONSULTATION_SLUG])):
+        started = time.time()
+        results = replay_from_archive(archive, consultation)
+        if not results:
+            print(f"[{consultation.slug}] Nothing to replay from {ARCHIVE_DIR}; left the dataset as it is")
+            continue
+        # Only the re-parsed rows are replaced: items the archive does not cover keep their current row
+        dataset_store.replace_rows(results, consultation.dataset_dir)
+        write_jsonl(consultation.jsonl_path, results, mode="a")
+        kept, _ = jsonl_store.compact(consultation.jsonl_path)
+        print(f"Replaced {len(results)} rows in {consultation.dataset_dir} and {consultation.jsonl_path} "
+              f"from {ARCHIVE_DIR} in {time.time() - started:.1f}s ({kept} rows in total)")
+
+
+# ------------------------------
+# Output
+# ------------------------------
+def write_jsonl(path: str, results: List[Dict], mode: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, mode, encoding="utf-8") as f:
         for r in results:
-            obj = {k: v for k, v in r.items() if k != "_qna_structured"}
+            obj = {k: v for k, v in r.items() if not k.startswith("_")}
             obj["qna"] = r.get("_qna_structured", [])
             f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-    print(f"Appended {len(results)} entries to JSONL: {jsonl_path}")
-    
-    # Save updated seen IDs state
-    save_seen_ids(new_seen_ids)
-    print(f"Updated state file with {len(new_seen_ids)} total seen IDs")
 
 
 if __name__ == "__main__":
-    asyncio.run(main_async())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape reactions from internetconsultatie.nl")
+    parser.add_argument("--consultation", action="append", metavar="SLUG",
+                        help=f"consultation to scrape; repeat for several (default: {CONSULTATION_SLUG})")
+    parser.add_argument("--replay", action="store_true",
+                        help=f"re-parse the pages archived in {ARCHIVE_DIR} into the dataset and JSONL without network access")
+    parser.add_argument("--archive", action="store_true",
+                        help=f"keep a gzip copy of every fetched page in {ARCHIVE_DIR} (needed for --replay)")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="also write the run's metrics to PATH in Prometheus text format")
+    args = parser.parse_args()
+    if args.prometheus:
+        PROMETHEUS_FILE = args.prometheus
+    if args.archive:
+        ARCHIVE_HTML = True
+    if args.replay:
+        main_replay(args.consultation)
+    else:
+        asyncio.run(main_async(args.consultation))
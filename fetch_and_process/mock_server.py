@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for internetconsultatie.nl, for benchmarking the scraper offline.
+
+Serves synthetic listing pages (/{slug}/reacties/datum/{page}/{per_page}) and
+detail pages (/{slug}/reactie/{uuid}) in the site's markup: the same pagination,
+result list, data table and h3/blockquote answers, wrapped in page chrome of a
+realistic size. Content is deterministic for a given --seed, so runs compare.
+
+Failure modes:
+    --latency-ms / --jitter-ms   response delay, uniform in latency +- jitter
+    --error-rate                 fraction of requests answered with a 500
+    --throttle-rate              fraction of requests answered with a 429
+    --burst-every / --burst-length
+                                 every burst-every seconds, answer all requests
+                                 with 429 for burst-length seconds
+    --retry-after                Retry-After seconds sent with every 429
+
+    python mock_server.py --items 2000 --throttle-rate 0.02 --burst-every 20 --burst-length 2
+
+GET /_stats returns request counts per status as JSON.
+"""
+
+import argparse
+import asyncio
+import html
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+DEFAULT_PORT = 8765
+DEFAULT_SLUG = "naturalisatietermijn"
+
+PLACES = ["Amsterdam", "Rotterdam", "Den Haag", "Utrecht", "Eindhoven", "Groningen", "Tilburg", "Almere",
+          "Breda", "Nijmegen", "Leiden", "Maastricht", "Zwolle", "Delft", "Haarlem"]
+MONTHS = ["januari", "februari", "maart", "april", "mei", "juni", "juli", "augustus", "september",
+          "oktober", "november", "december"]
+QUESTIONS = [
+    "Wat vindt u van het voorstel om de naturalisatietermijn te verlengen van 5 naar 10 jaar?",
+    "Welke gevolgen verwacht u van dit voorstel voor uzelf of voor anderen?",
+    "Heeft u verder nog opmerkingen over het wetsvoorstel?",
+]
+SENTENCES = [
+    "Ik ben het niet eens met dit voorstel.",
+    "Dit voorstel is een goede stap om integratie te bevorderen.",
+    "Tien jaar wachten is veel te lang voor mensen die hier al werken en belasting betalen.",
+    "Nederlanderschap moet je verdienen, dus een langere termijn vind ik redelijk.",
+    "Het maakt het voor mijn gezin onmogelijk om toekomstplannen te maken.",
+    "I have lived here for seven years and this change feels deeply unfair.",
+    "De overheid zou eerst de wachttijden bij de IND moeten oplossen.",
+    "Ik steun het voorstel omdat het de waarde van het staatsburgerschap benadrukt.",
+    "Many highly skilled migrants will leave the Netherlands because of this.",
+    "Het voorstel gaat voorbij aan de bijdrage die nieuwkomers leveren.",
+]
+
+# Page chrome around the content; real pages carry a large header, menus, scripts and a footer
+_NAV = "".join(f'<li class="menu__item"><a href="/pagina/{i}">Menu-item {i}</a></li>' for i in range(60))
+_FOOTER = "".join(f'<li><a href="/over/{i}">Over internetconsultatie {i}</a></li>' for i in range(40))
+_SCRIPT = "var config = {" + ",".join(f'"key{i}": "value{i}"' for i in range(200)) + "};"
+_STYLE = "".join(f".c{i} {{ margin: {i}px; }}" for i in range(150))
+
+
+def page(title: str, main: str) -> str:
+    return (
+        '<!DOCTYPE html><html lang="nl"><head><meta charset="utf-8">'
+        f"<title>{html.escape(title)} | Internetconsultatie</title><style>{_STYLE}</style>"
+        f"<script>{_SCRIPT}</script></head><body>"
+        f'<header class="header"><nav class="menu"><ul>{_NAV}</ul></nav></header>'
+        f'<div class="container" role="main" id="content">{main}</div>'
+        f'<footer class="footer"><ul>{_FOOTER}</ul></footer></body></html>'
+    )
+
+
+class MockSite:
+    def __init__(self, items: int = 1000, slug: str = DEFAULT_SLUG,
+                 latency_ms: float = 30.0, jitter_ms: float = 20.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, burst_every: float = 0.0, burst_length: float = 0.0,
+                 retry_after: float = 1.0, seed: int = 0):
+        self.slug = slug
+        self.latency = (max(0.0, latency_ms - jitter_ms) / 1000, (latency_ms + jitter_ms) / 1000)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.stats: Counter = Counter()
+        # Newest first, like the datum ordering of the real listing
+        self.ids: List[str] = [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{seed}/{n}")) for n in range(items, 0, -1)]
+        self.number: Dict[str, int] = {rid: items - i for i, rid in enumerate(self.ids)}
+
+    def reaction(self, n: int) -> Dict:
+        rng = random.Random(self.seed * 1_000_003 + n)
+        day, month = rng.randint(1, 28), rng.choice(MONTHS)
+        hour, minute = rng.randint(0, 23), rng.randint(0, 59)
+        answers = [" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 12))) for _ in QUESTIONS]
+        return {
+            "naam": f"Inzender {n}" if rng.random() < 0.7 else "Anoniem",
+            "plaats": rng.choice(PLACES),
+            "datum": f"{day} {month} 2025",
+            "tijd": f"{hour:02d}:{minute:02d}",
+            "answers": answers,
+        }
+
+    # ------------------------------
+    # Pages
+    # ------------------------------
+    def listing_html(self, page_no: int, per_page: int) -> str:
+        last_page = max(1, -(-len(self.ids) // per_page))
+        lis = []
+        for rid in self.ids[(page_no - 1) * per_page:page_no * per_page]:
+            r = self.reaction(self.number[rid])
+            lis.append(
+                f'<li><a href="/{self.slug}/reactie/{rid}">{html.escape(r["naam"])}</a>'
+                f'<p>{r["plaats"]} | {r["datum"]} ({r["tijd"]})</p></li>'
+            )
+        pages = sorted({1, max(1, page_no - 1), page_no, min(last_page, page_no + 1), last_page})
+        nav = "".join(f'<li><a href="/{self.slug}/reacties/datum/{p}/{per_page}">{p}</a></li>' for p in pages)
+        main = (
+            f'<h1>Reacties</h1><div class="result--list"><ul>{"".join(lis)}</ul></div>'
+            f'<div class="pagination"><div class="pagination__index"><ul>{nav}</ul></div></div>'
+        )
+        return page("Reacties", main)
+
+    def detail_html(self, n: int) -> str:
+        r = self.reaction(n)
+        table = (
+            '<table class="table__data-overview">'
+            f'<tr><th>Naam</th><td>{html.escape(r["naam"])}</td></tr>'
+            f'<tr><th>Plaats</th><td>{r["plaats"]}</td></tr>'
+            f'<tr><th>Datum</th><td>{r["datum"]} {r["tijd"]}</td></tr></table>'
+        )
+        qna = "".join(
+            f"<h3>{html.escape(q)}</h3><blockquote><p>{html.escape(a)}</p></blockquote>"
+            for q, a in zip(QUESTIONS, r["answers"])
+        )
+        return page(f"Reactie van {r['naam']}", f"<h1>Reactie</h1>{table}{qna}")
+
+    # ------------------------------
+    # Handlers
+    # ------------------------------
+    def in_burst(self) -> bool:
+        if not self.burst_every or not self.burst_length:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_length
+
+    def respond(self, text: str = "", status: int = 200, headers: Dict = None) -> web.Response:
+        self.stats[str(status)] += 1
+        if status != 200:
+            return web.Response(status=status, headers=headers)
+        return web.Response(text=text, content_type="text/html", charset="utf-8")
+
+    def injected_fault(self) -> Optional[web.Response]:
+        """A 429 or 500 for this request according to the failure options, or None to answer normally."""
+        if self.in_burst() or self.random.random() < self.throttle_rate:
+            return self.respond(status=429, headers={"Retry-After": f"{self.retry_after:g}"})
+        if self.random.random() < self.error_rate:
+            return self.respond(status=500)
+        return None
+
+    async def handle_listing(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.random.uniform(*self.latency))
+        page_no, per_page = int(request.match_info["page"]), int(request.match_info["per_page"])
+        fault = self.injected_fault()
+        return fault if fault is not None else self.respond(self.listing_html(page_no, max(1, per_page)))
+
+    async def handle_detail(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.random.uniform(*self.latency))
+        rid = request.match_info["rid"]
+        if rid not in self.number:
+            return self.respond(status=404)
+        fault = self.injected_fault()
+        return fault if fault is not None else self.respond(self.detail_html(self.number[rid]))
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(f"/{self.slug}/reacties/datum/{{page}}/{{per_page}}", self.handle_listing)
+        app.router.add_get(f"/{self.slug}/reactie/{{rid}}", self.handle_detail)
+        app.router.add_get("/_stats", self.handle_stats)
+        return app
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve a synthetic internetconsultatie.nl for benchmarking")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--items", type=int, default=1000, help="number of reactions (default 1000)")
+    parser.add_argument("--slug", default=DEFAULT_SLUG)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--burst-every", type=float, default=0.0)
+    parser.add_argument("--burst-length", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv: List[str] = None) -> None:
+    args = build_arg_parser().parse_args(argv)
+    site = MockSite(
+        items=args.items, slug=args.slug, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, burst_every=args.burst_every,
+        burst_length=args.burst_length, retry_after=args.retry_after, seed=args.seed,
+    )
+    print(f"Serving {args.items} reactions for /{args.slug} on http://127.0.0.1:{args.port}", flush=True)
+    web.run_app(site.app(), host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate clustering of reactions with MinHash signatures and an LSH index.
+
+Template and campaign submissions repeat almost the same answer text. Each
+reaction's normalized text is cut into word 3-shingles and summarized by a
+MinHash signature of NUM_PERM values; the signature is split into BANDS bands
+whose hashes form the LSH buckets. Reactions that share a bucket are compared
+on their signatures, and one whose estimated Jaccard similarity with an
+earlier reaction reaches SIMILARITY joins that reaction's cluster (otherwise it
+starts a new one).
+
+Signatures, buckets and cluster assignments are kept in SQLite, so update()
+only hashes and places reactions it has not seen before; existing cluster IDs
+never change. A cluster ID is derived from the key of its first member.
+
+    python near_duplicates.py update    # index new rows of the dataset store
+    python near_duplicates.py stats     # largest clusters (campaign detection)
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_DB = "data/near_duplicates.sqlite"
+NUM_PERM = 128
+BANDS = 16  # 8 signature values per band: pairs from about 0.7 Jaccard up are likely to share a bucket
+SIMILARITY = 0.8  # Estimated Jaccard similarity needed to join a cluster
+SHINGLE_WORDS = 3
+SEED = 1
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(SEED)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+_WORD_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    key        TEXT PRIMARY KEY,
+    signature  BLOB NOT NULL,
+    cluster_id TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS buckets (
+    band   INTEGER NOT NULL,
+    bucket BLOB NOT NULL,
+    key    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_band ON buckets (band, bucket);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def shingles(text: str) -> List[str]:
+    """Word SHINGLE_WORDS-grams of the lowercased text with punctuation dropped."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) <= SHINGLE_WORDS:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32 values) of the text, or None for text without words."""
+    parts = shingles(text)
+    if not parts:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(parts)), dtype=np.uint64) % _PRIME
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(sig: np.ndarray) -> List[bytes]:
+    rows = NUM_PERM // BANDS
+    return [hashlib.blake2b(sig[b * rows:(b + 1) * rows].tobytes(), digest_size=8).digest() for b in range(BANDS)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def cluster_id_for(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+class NearDuplicateIndex:
+    def __init__(self, path: str = INDEX_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        params = f"perm={NUM_PERM} bands={BANDS} shingle={SHINGLE_WORDS} seed={SEED}"
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if stored and stored[0] != params:
+            # Signatures made with other parameters cannot be compared; start over
+            print(f"{path} was built with {stored[0]}; rebuilding for {params}")
+            self.conn.executescript("DELETE FROM signatures; DELETE FROM buckets;")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)", (params,))
+        self.conn.commit()
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.clusters: Dict[str, str] = {}
+        for key, blob, cluster in self.conn.execute("SELECT key, signature, cluster_id FROM signatures"):
+            self.signatures[key] = np.frombuffer(blob, dtype=np.uint32)
+            self.clusters[key] = cluster
+        self.buckets: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+        for band, bucket, key in self.conn.execute("SELECT band, bucket, key FROM buckets"):
+            self.buckets[(band, bucket)].append(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.clusters
+
+    def __len__(self) -> int:
+        return len(self.clusters)
+
+    def _place(self, key: str, sig: np.ndarray) -> Tuple[str, List[Tuple[int, bytes, str]]]:
+        """Find the cluster of the most similar indexed reaction (or start one); returns (cluster, bucket rows)."""
+        best, best_sim = None, SIMILARITY
+        seen = set()
+        entries = []
+        for band, bucket in enumerate(band_buckets(sig)):
+            for other in self.buckets[(band, bucket)]:
+                if other not in seen:
+                    seen.add(other)
+                    sim = similarity(sig, self.signatures[other])
+                    if sim >= best_sim:
+                        best, best_sim = other, sim
+            entries.append((band, bucket, key))
+        cluster = self.clusters[best] if best is not None else cluster_id_for(key)
+        for band, bucket, _ in entries:
+            self.buckets[(band, bucket)].append(key)
+        self.signatures[key] = sig
+        self.clusters[key] = cluster
+        return cluster, entries
+
+    def update(self, items: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Index (key, text) pairs not seen before, in order, in one transaction.
+        Returns {key: cluster_id} for the newly indexed keys; texts without words are not indexed.
+        """
+        added: Dict[str, str] = {}
+        signature_rows, bucket_rows = [], []
+        for key, text in items:
+            if key in self.clusters or key in added:
+                continue
+            sig = signature(text)
+            if sig is None:
+                continue
+            cluster, entries = self._place(key, sig)
+            added[key] = cluster
+            signature_rows.append((key, sig.tobytes(), cluster))
+            bucket_rows += entries
+        with self.conn:
+            self.conn.executemany("INSERT INTO signatures (key, signature, cluster_id) VALUES (?, ?, ?)", signature_rows)
+            self.conn.executemany("INSERT INTO buckets (band, bucket, key) VALUES (?, ?, ?)", bucket_rows)
+        return added
+
+    def cluster_of(self, key: str) -> Optional[str]:
+        return self.clusters.get(key)
+
+    def sizes(self) -> Dict[str, int]:
+        sizes: Dict[str, int] = defaultdict(int)
+        for cluster in self.clusters.values():
+            sizes[cluster] += 1
+        return dict(sizes)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args == ["update"]:
+        from dataset_store import KEY, read_dataset
+        from local_classifier import row_texts
+        df = read_dataset()
+        with NearDuplicateIndex() as index:
+            added = index.update(zip(df[KEY], row_texts(df)))
+            print(f"Indexed {len(added)} new rows; {len(index)} rows in {len(index.sizes())} clusters")
+    elif args == ["stats"] or (args[:1] == ["stats"] and len(args) == 2):
+        top = int(args[1]) if len(args) == 2 else 20
+        with NearDuplicateIndex() as index:
+            sizes = index.sizes()
+            grouped = sum(n for n in sizes.values() if n > 1)
+            print(f"{len(index)} rows in {len(sizes)} clusters; {grouped} rows are in clusters of 2 or more")
+            for cluster, n in sorted(sizes.items(), key=lambda c: -c[1])[:top]:
+                if n > 1:
+                    print(f"  {cluster}  {n:>6} rows")
+    else:
+        print("usage: python near_duplicates.py update | stats [TOP]", file=sys.stderr)
+        sys.exit(2)
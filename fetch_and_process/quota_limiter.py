@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Client-side quota limiting for LLM API calls.
+
+QuotaLimiter keeps two token buckets, one for requests per minute and one for
+tokens per minute, refilled continuously. A call waits until both buckets hold
+enough for it, so any number of concurrent callers together stay within the
+quota. When the API still answers with a quota error (HTTP 429
+RESOURCE_EXHAUSTED) every caller pauses for the server's retry delay, or for an
+exponential backoff when none is given.
+"""
+
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Tuple, Type
+
+try:
+    import httpx  # transport of google-genai
+except ImportError:
+    httpx = None
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+QUOTA_STATUSES = {"RESOURCE_EXHAUSTED"}
+TRANSIENT_CODES = {429, 500, 502, 503, 504}
+# Timeouts and network failures below the API's own errors
+TRANSIENT_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    (asyncio.TimeoutError, ConnectionError)
+    + ((httpx.TransportError,) if httpx is not None else ())
+    + ((aiohttp.ClientError,) if aiohttp is not None else ())
+)
+ROW_ERROR_STATUSES = {"INVALID_ARGUMENT"}  # 400s caused by the request's content, i.e. possibly by one row
+
+# Gemini sends a google.rpc.RetryInfo detail such as {"retryDelay": "37s"}
+_RETRY_DELAY_RE = re.compile(r"'retryDelay': '(\d+(?:\.\d+)?)s'|\"retryDelay\": \"(\d+(?:\.\d+)?)s\"")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for Dutch and English)."""
+    return len(text) // 4 + 1
+
+
+def error_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    return error_code(exc) == 429 or getattr(exc, "status", None) in QUOTA_STATUSES
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Quota errors, server errors and timeouts are worth retrying; bad requests are not."""
+    if isinstance(exc, TRANSIENT_EXCEPTIONS):
+        return True
+    return error_code(exc) in TRANSIENT_CODES or is_quota_error(exc)
+
+
+def is_row_error(exc: BaseException) -> bool:
+    """
+    A 400 rejecting the request's content, which a single bad row can cause. Other client errors
+    (401/403, a 404 on the model, FAILED_PRECONDITION) fail every request alike.
+    """
+    return error_code(exc) == 400 and getattr(exc, "status", None) in ROW_ERROR_STATUSES | {None}
+
+
+def retry_delay(exc: BaseException) -> Optional[float]:
+    """The retry delay the server asked for, if the error carries one."""
+    # The delay may be in the structured details or only in the message
+    for text in (str(getattr(exc, "details", "")), str(exc)):
+        m = _RETRY_DELAY_RE.search(text)
+        if m:
+            return float(m.group(1) or m.group(2))
+    return None
+
+
+class TokenBucket:
+    """Holds up to `per_minute` units and refills at per_minute/60 units per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (amount is capped at the capacity)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Return (positive) or charge (negative) units after the fact."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class QuotaLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_in_flight: int = 8,
+                 base_backoff: float = 2.0, max_backoff: float = 120.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self._quota_streak = 0
+        # Counters for reporting
+        self.calls = 0
+        self.quota_errors = 0
+        self.waited = 0.0
+
+    async def _reserve(self, tokens: int) -> None:
+        # One waiter at a time takes from the buckets, so requests are admitted in arrival order
+        async with self._lock:
+            while True:
+                delay = max(self._paused_until - time.monotonic(),
+                            self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                self.waited += delay
+                await asyncio.sleep(delay)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+    @asynccontextmanager
+    async def call(self, estimated_tokens: int):
+        """Admit one API call of about `estimated_tokens` tokens (prompt plus expected output)."""
+        async with self.in_flight:
+            await self._reserve(estimated_tokens)
+            self.calls += 1
+            try:
+                yield
+            except Exception as e:
+                if is_quota_error(e):
+                    self.on_quota_error(e)
+                raise
+            else:
+                self._quota_streak = 0
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the API has reported what a call really used."""
+        if actual_tokens:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def on_quota_error(self, exc: BaseException) -> float:
+        """Pause every caller; returns the pause in seconds."""
+        self.quota_errors += 1
+        self._quota_streak += 1
+        pause = retry_delay(exc)
+        if pause is None:
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._quota_streak - 1))
+            pause = random.uniform(backoff / 2, backoff)
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        # The server's view of the window is fuller than ours: start the buckets empty again
+        self.requests.level = min(self.requests.level, 0.0)
+        self.tokens.level = min(self.tokens.level, 0.0)
+        print(f"    ~ Quota error ({exc.__class__.__name__} {error_code(exc)}); pausing all calls {pause:.1f}s")
+        return pause
+
+    def describe(self) -> str:
+        return f"{self.calls} calls, {self.quota_errors} quota errors, {self.waited:.1f}s waiting for quota"
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def describe_error(exc: BaseException) -> str:
+    code: Any = error_code(exc)
+    return f"{type(exc).__name__}{f' {code}' if code else ''}: {str(exc)[:200]}"
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive request pacing for the scraper.
+
+RateController replaces the fixed semaphore and sleeps with an AIMD loop:
+every fast, successful response nudges concurrency up (and the gap between
+request starts down) a little; 429/503 responses, timeouts and slow responses
+cut concurrency in half and widen the gap. Retry-After headers pause all new
+requests until the server says we may continue.
+"""
+
+import asyncio
+import sys
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import aiohttp
+
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RateController:
+    """AIMD controller for concurrency and pacing, shared by all requests to one host."""
+
+    def __init__(
+        self,
+        initial_concurrency: int = 5,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        initial_delay: float = 0.2,
+        min_delay: float = 0.0,
+        max_delay: float = 30.0,
+        target_latency: float = 2.0,
+        delay_decay: float = 0.15,
+        throttle_delay: float = 0.25,
+        max_retry_after: float = 600.0,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+        self.delay_decay = delay_decay
+        self.throttle_delay = throttle_delay
+        self.max_retry_after = max_retry_after  # a server's Retry-After is honoured up to this, not max_delay
+
+        self.concurrency = float(initial_concurrency)
+        self.delay = initial_delay
+
+        self._in_flight = 0
+        self._next_start = 0.0      # monotonic time the next request may start (pacing)
+        self._paused_until = 0.0    # monotonic time set from Retry-After / throttling
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+        self.successes = 0
+        self.throttles = 0
+        self.errors = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_concurrency, min(self.max_concurrency, int(self.concurrency)))
+
+    # ------------------------------
+    # Slot management
+    # ------------------------------
+    async def acquire(self) -> None:
+        async with self._cond:
+            while self._in_flight >= self.limit:
+                await self._cond.wait()
+            self._in_flight += 1
+            start_at = max(time.monotonic(), self._next_start)
+            self._next_start = start_at + self.delay
+
+        # Sleep outside the lock; re-check the pause in case a Retry-After arrived meanwhile
+        try:
+            while True:
+                wait = max(start_at, self._paused_until) - time.monotonic()
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # The caller never gets the slot, so request() will not release it
+            await self.release()
+            raise
+
+    async def release(self) -> None:
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def request(self):
+        """Hold one request slot and feed the outcome of the wrapped block back into the controller."""
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.on_failure(e)
+            raise
+        else:
+            self.on_success(time.monotonic() - started)
+        finally:
+            await self.release()
+
+    # ------------------------------
+    # Feedback
+    # ------------------------------
+    def on_success(self, latency: float) -> None:
+        self.successes += 1
+        if latency > self.target_latency:
+            if self._decrease(f"slow response ({latency:.1f}s)"):
+                self._widen_delay(1.5, self.throttle_delay / 10)
+            return
+        # Additive increase: roughly +1 concurrency per window of successful requests
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / max(self.concurrency, 1.0))
+        self.delay = self.delay * (1 - self.delay_decay)
+        if self.delay < max(self.min_delay, 0.001):
+            self.delay = self.min_delay
+
+    def on_failure(self, exc: BaseException) -> None:
+        if isinstance(exc, aiohttp.ClientResponseError) and exc.status in THROTTLE_STATUSES:
+            retry_after = parse_retry_after(exc.headers.get("Retry-After") if exc.headers else None)
+            self.on_throttle(exc.status, retry_after)
+        elif isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError)) or (
+            isinstance(exc, aiohttp.ClientResponseError) and exc.status >= 500
+        ):
+            self.errors += 1
+            if self._decrease(type(exc).__name__):
+                self._widen_delay(1.5, self.throttle_delay / 10)
+
+    def on_throttle(self, status: int, retry_after: Optional[float] = None) -> None:
+        self.throttles += 1
+        if retry_after is not None:
+            pause = min(retry_after, self.max_retry_after)
+        else:
+            pause = min(max(self.delay * 2, self.throttle_delay), self.max_delay)
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        if self._decrease(f"HTTP {status}, pausing {pause:.1f}s"):
+            self._widen_delay(2, self.throttle_delay)
+
+    def _widen_delay(self, factor: float, floor: float) -> None:
+        self.delay = min(self.max_delay, max(self.delay * factor, floor))
+
+    def _decrease(self, reason: str) -> bool:
+        """Halve concurrency; returns False if we already backed off within the last window."""
+        # Several in-flight requests usually report the same congestion event, so react once per window
+        now = time.monotonic()
+        if now - self._last_decrease < self.target_latency:
+            return False
+        self._last_decrease = now
+        self.concurrency = max(float(self.min_concurrency), self.concurrency / 2)
+        print(f"    ~ Backing off ({reason}): concurrency {self.limit}", file=sys.stderr)
+        return True
+
+    def describe(self) -> str:
+        return (f"concurrency {self.limit}, delay {self.delay:.2f}s, "
+                f"{self.successes} ok / {self.throttles} throttled / {self.errors} errors")
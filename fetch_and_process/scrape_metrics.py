@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-request metrics for the scraper, exported as a JSON run report and
+optionally in the Prometheus text format (e.g. for node_exporter's textfile
+collector).
+
+Recorded per run:
+    network time per HTTP fetch (histogram per page kind), response bytes,
+    status-code counts, fetch errors by type, retries,
+    parse time per page (measured inside the parse worker, histogram per kind),
+    time spent waiting for a rate-controller slot (histogram).
+"""
+
+import json
+import math
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds; wide enough for slow pages and long Retry-After pauses
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile (0..1) by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for bound, n in zip(self.bounds, self.counts):
+            if n and seen + n >= rank:
+                upper = self.max if math.isinf(bound) else min(bound, self.max)
+                lower = max(lower, self.min)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "min": round(self.min, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.50), 6),
+            "p90": round(self.quantile(0.90), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+            "buckets": {("+Inf" if math.isinf(b) else f"{b:g}"): n for b, n in zip(self.bounds, self.counts)},
+        }
+
+
+def timed_call(fn: Callable, *args) -> Tuple[Any, float]:
+    """Run fn(*args) and return (result, seconds); used inside parse workers so queueing is not counted."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class ScrapeMetrics:
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.network: Dict[str, Histogram] = {}
+        self.parse: Dict[str, Histogram] = {}
+        self.slot_wait = Histogram()
+        self.bytes: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.retries = 0
+        self.items: Counter = Counter()  # "ok" / "failed"
+
+    # ------------------------------
+    # Recording
+    # ------------------------------
+    def observe_fetch(self, kind: str, seconds: float, status: Optional[int], nbytes: int) -> None:
+        """One HTTP request; status is None when no response arrived (timeout, connection error)."""
+        self.network.setdefault(kind, Histogram()).observe(seconds)
+        self.statuses[str(status) if status is not None else "none"] += 1
+        self.bytes[kind] += nbytes
+
+    def observe_parse(self, kind: str, seconds: float) -> None:
+        self.parse.setdefault(kind, Histogram()).observe(seconds)
+
+    def observe_slot_wait(self, seconds: float) -> None:
+        self.slot_wait.observe(seconds)
+
+    def count_error(self, exc: BaseException) -> None:
+        self.errors[type(exc).__name__] += 1
+
+    def count_retry(self) -> None:
+        self.retries += 1
+
+    def count_item(self, ok: bool) -> None:
+        self.items["ok" if ok else "failed"] += 1
+
+    # ------------------------------
+    # Export
+    # ------------------------------
+    def report(self, extra: Optional[Dict] = None) -> Dict:
+        wall = time.perf_counter() - self._started
+        requests = sum(self.statuses.values())
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "wall_seconds": round(wall, 3),
+            "items": dict(self.items),
+            "items_per_sec": round(self.items["ok"] / wall, 3) if wall else 0.0,
+            "requests": requests,
+            "statuses": dict(self.statuses),
+            "throttled_share": round(self.statuses["429"] / requests, 4) if requests else 0.0,
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "bytes": dict(self.bytes),
+            # Summed over concurrent requests, so these can exceed wall_seconds
+            "time_totals_seconds": {
+                "network": round(sum(h.sum for h in self.network.values()), 3),
+                "parse": round(sum(h.sum for h in self.parse.values()), 3),
+                "slot_wait": round(self.slot_wait.sum, 3),
+            },
+            "network_seconds": {kind: h.to_dict() for kind, h in sorted(self.network.items())},
+            "parse_seconds": {kind: h.to_dict() for kind, h in sorted(self.parse.items())},
+            "slot_wait_seconds": self.slot_wait.to_dict(),
+            **(extra or {}),
+        }
+
+    def write_json(self, path: str, extra: Optional[Dict] = None) -> Dict:
+        report = self.report(extra)
+        _write_atomic(path, json.dumps(report, indent=2) + "\n")
+        return report
+
+    def to_prometheus(self, prefix: str = "scraper") -> str:
+        lines: List[str] = []
+
+        def histogram(name: str, help_text: str, series: Dict[str, Histogram], label: Optional[str]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for value, h in sorted(series.items()):
+                labels = f'{label}="{value}",' if label else ""
+                cumulative = 0
+                for bound, n in zip(h.bounds, h.counts):
+                    cumulative += n
+                    le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                    lines.append(f'{prefix}_{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+                suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+                lines.append(f"{prefix}_{name}_sum{suffix} {h.sum:.6f}")
+                lines.append(f"{prefix}_{name}_count{suffix} {h.count}")
+
+        def counter(name: str, help_text: str, series: Dict[str, float], label: Optional[str]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for value, n in sorted(series.items()):
+                labels = f'{{{label}="{value}"}}' if label else ""
+                lines.append(f"{prefix}_{name}{labels} {n}")
+
+        histogram("network_seconds", "Network time per HTTP fetch.", self.network, "kind")
+        histogram("parse_seconds", "Parse time per page inside the parse worker.", self.parse, "kind")
+        histogram("slot_wait_seconds", "Time spent waiting for a rate-controller slot.", {"": self.slot_wait}, None)
+        counter("responses_total", "HTTP requests by response status (none = no response).", self.statuses, "status")
+        counter("response_bytes_total", "Response body bytes by page kind.", self.bytes, "kind")
+        counter("fetch_errors_total", "Failed HTTP requests by exception type.", self.errors, "error")
+        counter("retries_total", "Page fetches (listing and detail) retried after an error.", {"": self.retries}, None)
+        counter("items_total", "Detail items by outcome.", self.items, "outcome")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        _write_atomic(path, self.to_prometheus())
+
+    def summary(self) -> str:
+        network = self.network.get("detail", Histogram())
+        parse = self.parse.get("detail", Histogram())
+        return (f"{sum(self.statuses.values())} requests {dict(self.statuses)}, {self.retries} retries, "
+                f"detail network p50 {network.quantile(0.5) * 1000:.0f} ms / p99 {network.quantile(0.99) * 1000:.0f} ms, "
+                f"detail parse p50 {parse.quantile(0.5) * 1000:.1f} ms, "
+                f"slot wait total {self.slot_wait.sum:.1f}s")
+
+
+def _write_atomic(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
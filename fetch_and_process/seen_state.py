@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Seen-state for incremental scraping, kept in a small SQLite index.
+
+Each fetched reaction (keyed by detail_relative) is one row with its first-seen
+time, last fetch time and the SHA-256 of its detail page. Membership checks are
+primary-key lookups, so startup cost does not grow with history, and every
+add_many() call is one atomic transaction: a crash mid-run keeps all previously
+committed batches and never leaves a half-written state file. A SeenStore may
+be used from several threads (main_batched.py commits batches in a worker
+thread); its calls take turns on the one connection.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    id            TEXT PRIMARY KEY,
+    first_seen_at TEXT NOT NULL,
+    fetched_at    TEXT,
+    content_hash  TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class SeenStore:
+    def __init__(self, path: str, legacy_json: Optional[str] = None):
+        self.path = path
+        is_new = not os.path.exists(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        if is_new and legacy_json and os.path.exists(legacy_json):
+            self.import_json(legacy_json)
+
+    def import_json(self, json_path: str) -> int:
+        """One-time migration from the old sorted JSON array of IDs."""
+        with open(json_path, "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        now = utc_now()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen (id, first_seen_at) VALUES (?, ?)", ((i, now) for i in ids)
+            )
+        print(f"Migrated {len(ids)} seen IDs from {json_path} to {self.path}")
+        return len(ids)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM seen WHERE id = ?", (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [key for (key,) in self.conn.execute("SELECT id FROM seen ORDER BY id")]
+        yield from keys
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, first_seen_at, fetched_at, content_hash FROM seen WHERE id = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "first_seen_at", "fetched_at", "content_hash"), row))
+
+    def add_many(self, records: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> None:
+        """Commit (id, fetched_at, content_hash) records in a single transaction."""
+        now = utc_now()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO seen (id, first_seen_at, fetched_at, content_hash) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET fetched_at = excluded.fetched_at, content_hash = excluded.content_hash
+                """,
+                ((key, now, fetched_at, content_hash) for key, fetched_at, content_hash in records),
+            )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        """Store a small run-state value; None deletes it."""
+        with self._lock, self.conn:
+            if value is None:
+                self.conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
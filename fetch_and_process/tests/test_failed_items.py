@@ -0,0 +1,23 @@
+import main_batched
+
+ITEM = {"detail_relative": "/r/1", "detail_url": "https://example.org/r/1"}
+
+
+def test_success_removes_the_dead_letter_record():
+    records = main_batched.update_failed_items([], [main_batched.failed_result(ITEM, "TimeoutError: timed out")])
+    assert [rec["failures"] for rec in records] == [1]
+    assert main_batched.update_failed_items(records, [dict(ITEM, qna_text="text")]) == []
+
+
+def test_non_retryable_failure_is_not_dead_lettered():
+    failed = main_batched.failed_result(ITEM, "ClientResponseError: 404, message='Not Found'", retryable=False)
+    assert main_batched.update_failed_items([], [failed]) == []
+
+
+def test_item_is_dropped_after_max_failures():
+    records = []
+    for _ in range(main_batched.MAX_FAILURES - 1):
+        records = main_batched.update_failed_items(records, [main_batched.failed_result(ITEM, "TimeoutError: timed out")])
+    assert [rec["failures"] for rec in records] == [main_batched.MAX_FAILURES - 1]
+    records = main_batched.update_failed_items(records, [main_batched.failed_result(ITEM, "TimeoutError: timed out")])
+    assert records == []
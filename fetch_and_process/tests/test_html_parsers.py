@@ -0,0 +1,65 @@
+import glob
+import os
+
+import pytest
+
+from html_parsers import BeautifulSoupParser, compare_backends, read_page
+
+pytest.importorskip("lxml")
+from html_parsers import LxmlParser  # noqa: E402
+
+BASE = "https://internetconsultatie.nl"
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# html.parser does not close <td>, <li> and <p> implicitly as browsers (and lxml) do
+KNOWN_DIFFERENCES = {"malformed_td_unclosed.html", "malformed_list_li_unclosed.html"}
+
+
+def fixture(name):
+    return read_page(os.path.join(FIXTURES, name))
+
+
+def fixture_names():
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(FIXTURES, "*.html")))
+
+
+@pytest.mark.parametrize("name", [
+    pytest.param(name, marks=pytest.mark.xfail(strict=True, reason="html.parser lacks implied end tags"))
+    if name in KNOWN_DIFFERENCES else name
+    for name in fixture_names()
+])
+def test_backends_agree(name):
+    assert compare_backends(fixture(name), BASE) is None
+
+
+@pytest.mark.parametrize("parser", [BeautifulSoupParser(), LxmlParser()], ids=["bs4", "lxml"])
+def test_detail_page(parser):
+    detail = parser.parse_detail_html(fixture("detail.html"))
+    assert detail["detail_naam"] == "Inzender 3"
+    assert detail["detail_plaats"] == "Nijmegen"
+    assert detail["detail_datum"] == "8 oktober 2025 17:08"
+    assert [q["vraag"] for q in detail["qna"]][:2] == [
+        "Wat vindt u van het voorstel om de naturalisatietermijn te verlengen van 5 naar 10 jaar?",
+        "Welke gevolgen verwacht u van dit voorstel voor uzelf of voor anderen?",
+    ]
+    assert all(q["antwoord"] for q in detail["qna"])
+
+
+@pytest.mark.parametrize("parser", [BeautifulSoupParser(), LxmlParser()], ids=["bs4", "lxml"])
+def test_list_page(parser):
+    html = fixture("list.html")
+    items = parser.parse_list_items(html, BASE)
+    assert len(items) == 10
+    assert items[0]["list_place"] == "Nijmegen"
+    assert items[0]["list_date_time"] == "18 mei 2025 (19:01)"
+    assert items[0]["detail_url"] == BASE + items[0]["detail_relative"]
+    assert parser.detect_last_page(html) == 3
+
+
+def test_lxml_closes_implied_end_tags():
+    detail = LxmlParser().parse_detail_html(fixture("malformed_td_unclosed.html"))
+    assert (detail["detail_naam"], detail["detail_plaats"]) == ("Inzender 5", "Delft")
+    items = LxmlParser().parse_list_items(fixture("malformed_list_li_unclosed.html"), BASE)
+    assert [(i["list_name"], i["list_place"], i["list_date_time"]) for i in items] == [
+        ("Inzender 1", "Leiden", "1 mei 2025 (10:00)"),
+        ("Anoniem", "Delft", "2 mei 2025 (11:30)"),
+    ]
@@ -0,0 +1,111 @@
+import json
+
+import httpx
+import pytest
+from google.genai import errors
+
+import analytics
+from dataset_store import KEY, append_rows, read_dataset
+from fake_gemini import ITEMS_MARKER, FakeModels
+
+GOOD = "Ik ben tegen dit voorstel, tien jaar is veel te lang."
+BAD = "Deze reactie kan het model niet verwerken."
+
+
+class ScriptedModels(FakeModels):
+    """Fake backend that rejects every call containing `fail_text` and records the texts it was sent."""
+
+    def __init__(self, fail_text=None):
+        super().__init__(latency_ms=0, jitter_ms=0, ms_per_item=0)
+        self.fail_text = fail_text
+        self.sent = []
+
+    async def generate_content(self, model, contents, config=None):
+        items = json.loads(contents.split(ITEMS_MARKER, 1)[1])
+        self.sent += [it["text"] for it in items]
+        if self.fail_text and any(it["text"] == self.fail_text for it in items):
+            raise errors.ClientError(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message": "bad"}})
+        return await super().generate_content(model, contents, config)
+
+
+def client(models):
+    return type("Client", (), {"aio": type("AsyncClient", (), {"models": models})()})()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, "USE_CACHE", False)
+    monkeypatch.setattr(analytics, "USE_NEAR_DUPLICATES", False)
+    monkeypatch.setattr(analytics, "USE_LOCAL_CLASSIFIER", False)
+    monkeypatch.setattr(analytics, "RETRY_UNLABELABLE", False)
+    append_rows([{KEY: "/r/good", "qna_text": GOOD}, {KEY: "/r/bad", "qna_text": BAD}])
+    yield
+    analytics.set_client(None)
+
+
+def row(key):
+    df = read_dataset()
+    return df[df[KEY] == key].iloc[0]
+
+
+def test_label_error_is_cleared_once_the_row_is_labeled(store, monkeypatch):
+    analytics.run(["stance"], client=client(ScriptedModels(fail_text=BAD)))
+    assert row("/r/bad")["stance"] is None
+    assert row("/r/bad")["label_error"]
+    assert row("/r/good")["stance"] is not None
+
+    monkeypatch.setattr(analytics, "RETRY_UNLABELABLE", True)
+    analytics.run(["stance"], client=client(ScriptedModels()))
+    assert row("/r/bad")["stance"] is not None
+    assert row("/r/bad")["label_error"] is None
+
+    # With retries off again, the row is no longer skipped as unlabelable
+    monkeypatch.setattr(analytics, "RETRY_UNLABELABLE", False)
+    models = ScriptedModels()
+    analytics.run(["stance"], relabel=True, client=client(models))
+    assert BAD in models.sent
+    assert row("/r/bad")["label_error"] is None
+
+
+class ForbiddenModels(FakeModels):
+    def __init__(self):
+        super().__init__(latency_ms=0, jitter_ms=0, ms_per_item=0)
+
+    async def generate_content(self, model, contents, config=None):
+        self.stats["calls"] += 1
+        raise errors.ClientError(403, {"error": {"code": 403, "status": "PERMISSION_DENIED", "message": "denied"}})
+
+
+def test_permission_error_stops_the_run_without_marking_rows(store):
+    models = ForbiddenModels()
+    with pytest.raises(errors.ClientError):
+        analytics.run(["stance"], client=client(models))
+    assert models.stats["calls"] == 1  # not bisected
+    for key in ("/r/good", "/r/bad"):
+        assert row(key).get("label_error") is None
+        assert row(key).get("stance") is None
+
+
+class TimeoutModels(FakeModels):
+    def __init__(self):
+        super().__init__(latency_ms=0, jitter_ms=0, ms_per_item=0)
+
+    async def generate_content(self, model, contents, config=None):
+        raise httpx.ReadTimeout("timed out")
+
+
+def test_network_timeout_leaves_rows_for_the_next_run(store, monkeypatch):
+    monkeypatch.setattr(analytics, "MAX_ATTEMPTS", 1)
+    analytics.run(["stance"], client=client(TimeoutModels()))
+    for key in ("/r/good", "/r/bad"):
+        assert row(key).get("label_error") is None
+
+
+def test_invalid_filter_is_a_usage_error(store, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["analytics.py", "--where", "no_such_column == 1"])
+    monkeypatch.setattr(analytics, "run", lambda *args: pytest.fail("labeling started"))
+    with pytest.raises(SystemExit) as exit_info:
+        analytics.main()
+    assert exit_info.value.code == 2
+    assert "cannot evaluate row filter" in capsys.readouterr().err
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import analytics
+from dataset_store import KEY, append_labels, append_rows, read_dataset
+from fake_gemini import FakeClient
+from local_classifier import llm_labeled
+
+DUTCH = ("Ik ben het niet eens met dit voorstel. Wie hier al jaren woont, werkt en belasting betaalt, "
+         "moet na vijf jaar Nederlander kunnen worden. Tien jaar wachten is veel te lang.")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, "USE_CACHE", False)
+    monkeypatch.setattr(analytics, "USE_NEAR_DUPLICATES", False)
+    append_rows([{KEY: "/r/1", "qna_text": DUTCH}])
+    yield
+    analytics.set_client(None)
+
+
+def relabel_language():
+    analytics.run(["language"], relabel=True, client=FakeClient(latency_ms=0, jitter_ms=0, ms_per_item=0))
+    return read_dataset().set_index(KEY)
+
+
+@pytest.mark.parametrize("source", ["label_source", "stance_source"])
+def test_llm_language_keeps_a_local_stance_out_of_training(store, monkeypatch, source):
+    monkeypatch.setattr(analytics, "USE_LOCAL_CLASSIFIER", False)
+    append_labels(pd.DataFrame({KEY: ["/r/1"], "stance": ["Against"], source: ["local"]}), ["stance", source])
+
+    df = relabel_language()
+    assert df.at["/r/1", "language_source"] == "llm"
+    assert df.at["/r/1", "stance"] == "Against"
+    assert llm_labeled(df, "stance").empty
+    assert list(llm_labeled(df, "language").index) == ["/r/1"]
+
+
+def test_local_language_keeps_an_llm_stance_in_training(store, monkeypatch):
+    monkeypatch.setattr(analytics, "USE_LOCAL_CLASSIFIER", True)
+    append_labels(pd.DataFrame({KEY: ["/r/1"], "stance": ["Against"], "label_source": ["llm"]}),
+                  ["stance", "label_source"])
+
+    df = relabel_language()
+    assert df.at["/r/1", "language_source"] == "local"
+    assert list(llm_labeled(df, "stance").index) == ["/r/1"]
+    assert llm_labeled(df, "language").empty
@@ -0,0 +1,62 @@
+import json
+import os
+
+import numpy as np
+
+from lang_id import CORPUS_DIR, LANGUAGES, MIN_CONFIDENCE, PROFILES_PATH, build_profiles, detect
+
+# Held out: none of these sentences is in lang_corpus/
+DUTCH = [
+    "Ik vind het onterecht dat mensen die hier al jaren wonen nog langer moeten wachten op een Nederlands paspoort.",
+    "Als verpleegkundige werk ik elke dag samen met collega's uit alle delen van de wereld. Zonder hen zou de zorg instorten.",
+    "Ik steun dit wetsvoorstel. Wie Nederlander wil worden, moet aantonen dat hij zich voor langere tijd aan dit land verbindt.",
+    "Mijn dochter is hier geboren, maar omdat wij nog geen Nederlanders zijn, voelt ze zich soms een buitenstaander op school.",
+    "Het kabinet zegt dat de termijn de integratie bevordert, maar in de toelichting staat geen enkel onderzoek dat dit aantoont.",
+    "Ik ben tegen. Tien jaar is een halve jeugd voor een kind dat hier opgroeit.",
+    "Graag zou ik zien dat de regering eerst investeert in taallessen en begeleiding in plaats van de drempel te verhogen.",
+    "De IND heeft nu al een enorme achterstand. Dit voorstel lost daar niets aan op en maakt het alleen maar ingewikkelder.",
+    "Ik kwam als student naar Groningen, heb hier mijn partner ontmoet en wil hier de rest van mijn leven blijven.",
+    "Voor vluchtelingen betekent dit nog meer jaren van onzekerheid, terwijl zij juist rust en perspectief nodig hebben.",
+]
+ENGLISH = [
+    "I moved to the Netherlands for work seven years ago and this proposal makes me feel like I will never really belong.",
+    "Extending the waiting period will push skilled workers to countries that value their contribution more quickly.",
+    "I support this bill. Citizenship should reflect a long-term commitment to the country and its values.",
+    "My wife and I have paid taxes here for years, yet we still cannot vote in national elections.",
+    "The explanatory memorandum offers no evidence that a longer period leads to better integration.",
+    "Please reconsider. Ten years is a very long time for families who have already built their lives here.",
+    "As a researcher at a Dutch university, I see many talented colleagues leaving because of uncertain residence rules.",
+    "I learned Dutch, passed the integration exam and volunteer every week, so why should I wait twice as long?",
+    "Our children were born here and speak Dutch at home, but they still grow up feeling like outsiders.",
+    "The government should focus on improving language courses instead of making the process harder.",
+]
+OTHER = [
+    "Ich bin gegen diesen Vorschlag, weil zehn Jahre viel zu lang sind und die Integration erschwert.",
+    "Ich lebe seit acht Jahren in den Niederlanden und arbeite hier als Ingenieur in einem großen Unternehmen.",
+    "Meine Kinder sind hier geboren und sprechen besser Niederländisch als Deutsch.",
+    "Je vis aux Pays-Bas depuis neuf ans et je trouve cette réforme injuste pour ma famille.",
+    "Vivo en Holanda desde hace siete años y esta propuesta me parece muy injusta.",
+    "Vivo nei Paesi Bassi da sei anni e questa proposta mi sembra ingiusta.",
+]
+
+
+def test_held_out_dutch_and_english():
+    labels, confidence = detect(DUTCH + ENGLISH)
+    assert labels == ["Dutch"] * len(DUTCH) + ["English"] * len(ENGLISH)
+    # Most plain single-language reactions should not need the LLM
+    assert np.mean(confidence >= MIN_CONFIDENCE) >= 0.7
+
+
+def test_other_languages_are_never_confidently_dutch_or_english():
+    labels, confidence = detect(OTHER)
+    assert not any(label != "Other" and c >= MIN_CONFIDENCE for label, c in zip(labels, confidence))
+    assert labels[:3] == ["Other"] * 3  # German was the language most often taken for Dutch
+
+
+def test_profiles_are_built_from_the_committed_corpus():
+    corpora = {}
+    for code in LANGUAGES:
+        with open(os.path.join(CORPUS_DIR, f"{code}.txt"), "r", encoding="utf-8") as f:
+            corpora[code] = f.read()
+    with open(PROFILES_PATH, "r", encoding="utf-8") as f:
+        assert json.load(f) == build_profiles(corpora)
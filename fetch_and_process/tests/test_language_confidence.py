@@ -0,0 +1,27 @@
+import analytics
+from dataset_store import KEY, append_rows, read_dataset
+from fake_gemini import FakeClient
+
+DUTCH = ("Ik ben het niet eens met dit voorstel. Wie hier al jaren woont, werkt en belasting betaalt, "
+         "moet na vijf jaar Nederlander kunnen worden. Tien jaar wachten is veel te lang.")
+SHORT = "ok"
+
+
+def test_language_confidence_is_kept_for_local_and_gemini_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, "USE_CACHE", False)
+    monkeypatch.setattr(analytics, "USE_NEAR_DUPLICATES", False)
+    monkeypatch.setattr(analytics, "USE_LOCAL_CLASSIFIER", True)
+    append_rows([{KEY: "/r/dutch", "qna_text": DUTCH}, {KEY: "/r/short", "qna_text": SHORT}])
+    try:
+        analytics.run(["language"], client=FakeClient(latency_ms=0, jitter_ms=0, ms_per_item=0))
+    finally:
+        analytics.set_client(None)
+
+    df = read_dataset().set_index(KEY)
+    assert df.at["/r/dutch", "language"] == "Dutch"
+    assert df.at["/r/dutch", "language_source"] == "local"
+    assert float(df.at["/r/dutch", "language_confidence"]) >= analytics.LANGUAGE_MIN_CONFIDENCE
+    # Too short for the detector: labeled by Gemini, with the detector's low confidence recorded
+    assert df.at["/r/short", "language_source"] == "llm"
+    assert float(df.at["/r/short", "language_confidence"]) < analytics.LANGUAGE_MIN_CONFIDENCE
@@ -0,0 +1,35 @@
+from google.genai import errors
+
+from quota_limiter import retry_delay
+
+
+class MessageOnlyError(Exception):
+    details = {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}
+
+
+def test_retry_delay_from_details():
+    exc = errors.ClientError(429, {"error": {
+        "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded",
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "7s"}],
+    }})
+    assert retry_delay(exc) == 7.0
+
+
+def test_retry_delay_from_message_when_details_have_none():
+    exc = MessageOnlyError("429 RESOURCE_EXHAUSTED. {'error': {'details': [{'retryDelay': '12.5s'}]}}")
+    assert retry_delay(exc) == 12.5
+
+
+def test_no_retry_delay():
+    assert retry_delay(MessageOnlyError("Quota exceeded")) is None
+
+
+def test_transport_errors_are_transient():
+    import aiohttp
+    import httpx
+
+    from quota_limiter import is_row_error, is_transient_error
+
+    for exc in (httpx.ReadTimeout("timed out"), httpx.ConnectError("refused"), aiohttp.ServerDisconnectedError()):
+        assert is_transient_error(exc)
+        assert not is_row_error(exc)
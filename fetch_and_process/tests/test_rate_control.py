@@ -0,0 +1,27 @@
+import asyncio
+import time
+
+from rate_control import RateController
+
+
+def test_cancel_during_pacing_sleep_releases_the_slot():
+    async def scenario():
+        rate = RateController(initial_concurrency=1, max_concurrency=1, initial_delay=0.0)
+        rate.on_throttle(429, retry_after=60)  # every new request now sleeps in acquire()
+        waiter = asyncio.create_task(rate.acquire())
+        await asyncio.sleep(0.01)
+        assert rate._in_flight == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return rate._in_flight
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_retry_after_is_honoured_beyond_max_delay():
+    rate = RateController(max_delay=30.0, max_retry_after=600.0)
+    rate.on_throttle(429, retry_after=120)
+    assert rate._paused_until - time.monotonic() > 100
+    rate = RateController(max_delay=30.0, max_retry_after=600.0)
+    rate.on_throttle(429, retry_after=3600)
+    assert rate._paused_until - time.monotonic() <= 600
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import dataset_store
+import main_batched
+from html_archive import HtmlArchive
+from mock_server import MockSite
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A store and JSONL backup with five scraped rows, all of them with outdated text."""
+    monkeypatch.chdir(tmp_path)
+    site = MockSite(items=5)
+    consultation = main_batched.Consultation.for_slug(main_batched.CONSULTATION_SLUG)
+    site.list_url = main_batched.list_page_url(consultation.list_root, 1)
+    site.list_html = site.listing_html(1, 10)
+    site.items = main_batched.PARSER.parse_list_items(site.list_html, main_batched.BASE)
+    old = [dict(item, qna_text="old") for item in site.items]
+    dataset_store.append_rows(old)
+    main_batched.write_jsonl(main_batched.JSONL_PATH, old, mode="a")
+    return site
+
+
+def archive(site, items):
+    archive = HtmlArchive(main_batched.ARCHIVE_DIR)
+    archive.put(site.list_url, site.list_html, "list")
+    for item in items:
+        rid = item["detail_url"].rstrip("/").rsplit("/", 1)[-1]
+        archive.put(item["detail_url"], site.detail_html(site.number[rid]), "detail")
+
+
+def texts():
+    rows = dataset_store.read_rows()
+    with open(main_batched.JSONL_PATH, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    return dict(zip(rows[dataset_store.KEY], rows["qna_text"])), {r[dataset_store.KEY]: r["qna_text"] for r in records}
+
+
+def test_replay_of_a_partial_archive_keeps_the_other_rows(site):
+    archive(site, site.items[:2])
+    main_batched.main_replay()
+
+    rows, records = texts()
+    assert list(rows) == [item["detail_relative"] for item in site.items]
+    assert len(records) == 5
+    for item in site.items[:2]:
+        assert rows[item["detail_relative"]] != "old"
+        assert records[item["detail_relative"]] == rows[item["detail_relative"]]
+    for item in site.items[2:]:
+        assert rows[item["detail_relative"]] == "old"
+        assert records[item["detail_relative"]] == "old"
+
+
+def test_replay_of_an_empty_archive_changes_nothing(site):
+    main_batched.main_replay()
+
+    rows, records = texts()
+    assert set(rows.values()) == {"old"} and len(rows) == 5
+    assert set(records.values()) == {"old"} and len(records) == 5
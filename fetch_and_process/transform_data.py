@@ -1,10 +1,14 @@
-import pandas as pd
 import os
 
-df = pd.read_csv("data/natur_reacties_full.csv")
+from dataset_store import read_dataset
+
+df = read_dataset()
 
 # Define columns to drop, but only drop those that exist
-columns_to_drop = ["list_name", "detail_relative", "detail_url", "detail_naam", "qna_text", "qna_count", "raw_html_length", "qna", "identifies_as_immigrant"]
+columns_to_drop = ["list_name", "detail_relative", "detail_url", "detail_naam", "qna_text", "qna_count", "raw_html_length", "qna", "identifies_as_immigrant",
+                   # Labeling bookkeeping from analytics.py, not for publication
+                   "label_source", "language_source", "stance_source", "identifies_as_immigrant_source",
+                   "label_error", "cluster_id", "language_confidence"]
 existing_columns_to_drop = [col for col in columns_to_drop if col in df.columns]
 
 df_clean = df.drop(columns=existing_columns_to_drop)
@@ -1,23 +1,33 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Restore the CSV file from the JSONL backup
+Restore the CSV file from the Parquet dataset store (or from the JSONL backup)
 """
 
-import json
+import os
+import sys
 import pandas as pd
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "fetch_and_process"))
+import dataset_store
+import jsonl_store
+
+DATASET_DIR = os.path.join(HERE, "fetch_and_process", dataset_store.DATASET_DIR)
 JSONL_PATH = "natur_reacties.jsonl"
 CSV_OUTPUT = "natur_reacties.csv"
 
+def restore_csv_from_dataset():
+    """Export the dataset store (rows plus current labels) to CSV"""
+    df = dataset_store.export_csv(CSV_OUTPUT, DATASET_DIR)
+    print(f"✓ Restored {len(df)} rows from {DATASET_DIR} to {CSV_OUTPUT}")
+    print(f"✓ Columns: {', '.join(df.columns.tolist())}")
+    return df
+
 def restore_csv_from_jsonl():
-    """Read JSONL file and convert to CSV"""
-    data = []
-    
-    with open(JSONL_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                data.append(json.loads(line))
+    """Read the latest record per ID from the JSONL file (via its offset index) and convert to CSV"""
+    with jsonl_store.JsonlReader(JSONL_PATH) as reader:
+        data = list(reader.records())
     
     # Convert to DataFrame
     df = pd.DataFrame(data)
@@ -31,4 +41,7 @@ def restore_csv_from_jsonl():
     return df
 
 if __name__ == "__main__":
-    df = restore_csv_from_jsonl()
+    if dataset_store.has_rows(DATASET_DIR):
+        df = restore_csv_from_dataset()
+    else:
+        df = restore_csv_from_jsonl()